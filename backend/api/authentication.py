@@ -0,0 +1,253 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from users.models import User
+
+CACHED_USER_FIELDS = [
+    field.attname for field in User._meta.concrete_fields
+    if field.name != 'password'
+]
+
+
+class TokenCache:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self):
+        alias = settings.TOKEN_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    @staticmethod
+    def shared_key(key):
+        return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+    @staticmethod
+    def dump(user):
+        return tuple(getattr(user, field) for field in CACHED_USER_FIELDS)
+
+    @staticmethod
+    def load(values):
+        return User.from_db('default', CACHED_USER_FIELDS, values)
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[1] > time.monotonic():
+                self._items.move_to_end(key)
+                self.local_hits += 1
+                return self.load(item[0])
+            self._items.pop(key, None)
+        values = None
+        if self.shared is not None:
+            values = self.shared.get(self.shared_key(key))
+        if values is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.shared_hits += 1
+        self.set_local(key, values)
+        return self.load(values)
+
+    def set_local(self, key, values):
+        with self._lock:
+            self._items[key] = (
+                values, time.monotonic() + settings.TOKEN_CACHE_LOCAL_TIMEOUT
+            )
+            self._items.move_to_end(key)
+            while len(self._items) > settings.TOKEN_CACHE_SIZE:
+                self._items.popitem(last=False)
+
+    def set(self, key, user):
+        values = self.dump(user)
+        self.set_local(key, values)
+        if self.shared is not None:
+            self.shared.set(
+                self.shared_key(key), values, settings.TOKEN_CACHE_TIMEOUT
+            )
+
+    def invalidate(self, keys):
+        keys = list(keys)
+        with self._lock:
+            for key in keys:
+                self._items.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete_many([self.shared_key(key) for key in keys])
+
+    def stats(self):
+        with self._lock:
+            hits = self.local_hits + self.shared_hits
+            total = hits + self.misses
+            return {
+                'size': len(self._items),
+                'local_hits': self.local_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_ratio': hits / total if total else None,
+            }
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        user = token_cache.get(key)
+        if user is not None:
+            return user, Token(key=key, user=user)
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user)
+        return user, token
+
+
+STATELESS_USER_CLAIMS = ('is_staff', 'is_superuser')
+
+
+def revoked_session_key(session):
+    return f'auth-revoked:session:{session}'
+
+
+def revoked_user_key(user_id):
+    return f'auth-revoked:user:{user_id}'
+
+
+def access_token_for(user, session):
+    token = AccessToken()
+    token[api_settings.USER_ID_CLAIM] = user.id
+    token['iat'] = token.current_time.timestamp()
+    token['sid'] = session
+    for claim in STATELESS_USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+def issue_tokens(user):
+    refresh = RefreshToken.for_user(user)
+    refresh['iat'] = refresh.current_time.timestamp()
+    return access_token_for(user, refresh['jti']), refresh
+
+
+def revocations():
+    return caches[settings.AUTH_REVOCATION_CACHE_ALIAS]
+
+
+def load_revocations(session, user_id):
+    keys = [revoked_session_key(session), revoked_user_key(user_id)]
+    revoked = revocations().get_many(keys)
+    return keys[0] in revoked, revoked.get(keys[1], 0)
+
+
+class RevocationCache:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, session, user_id):
+        key = (session, user_id)
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[1] > time.monotonic():
+                self._items.move_to_end(key)
+                return item[0]
+            self._items.pop(key, None)
+        values = load_revocations(session, user_id)
+        with self._lock:
+            self._items[key] = (
+                values,
+                time.monotonic() + settings.AUTH_REVOCATION_LOCAL_TIMEOUT
+            )
+            self._items.move_to_end(key)
+            while len(self._items) > settings.TOKEN_CACHE_SIZE:
+                self._items.popitem(last=False)
+        return values
+
+    def forget(self, session=None, user_id=None):
+        with self._lock:
+            for key in [
+                key for key in self._items
+                if key[0] == session or key[1] == user_id
+            ]:
+                del self._items[key]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+revocation_cache = RevocationCache()
+
+
+def is_revoked(token, session, local=True):
+    user_id = token[api_settings.USER_ID_CLAIM]
+    if local:
+        revoked, revoked_at = revocation_cache.get(session, user_id)
+    else:
+        revoked, revoked_at = load_revocations(session, user_id)
+    return revoked or token.get('iat', 0) < revoked_at
+
+
+def revoke_session(session):
+    revocations().set(
+        revoked_session_key(session), True,
+        api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()
+    )
+    revocation_cache.forget(session=session)
+
+
+def revoke_user(user_id):
+    revocations().set(
+        revoked_user_key(user_id), time.time(),
+        api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()
+    )
+    revocation_cache.forget(user_id=user_id)
+
+
+class StatelessTokenAuthentication(JWTAuthentication):
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None or raw_token.count(b'.') != 2:
+            return None
+        token = self.get_validated_token(raw_token)
+        if is_revoked(token, token['sid']):
+            raise AuthenticationFailed('Токен отозван', code='token_revoked')
+        return self.get_user(token), token
+
+    def get_user(self, validated_token):
+        claims = {
+            'id': validated_token[api_settings.USER_ID_CLAIM],
+            'is_active': True,
+            **{
+                claim: validated_token[claim]
+                for claim in STATELESS_USER_CLAIMS
+            }
+        }
+        fields = [
+            field.attname for field in User._meta.concrete_fields
+            if field.attname in claims
+        ]
+        return User.from_db(
+            'default', fields, [claims[field] for field in fields]
+        )
@@ -1,8 +1,21 @@
 import base64
+import binascii
+from tempfile import SpooledTemporaryFile
 
 import webcolors
-from django.core.files.base import ContentFile
-from rest_framework.serializers import Field, ImageField, ValidationError
+from django.conf import settings
+from django.core.files import File
+from rest_framework.serializers import (
+    Field,
+    ImageField,
+    ReadOnlyField,
+    ValidationError
+)
+
+from recipes.images import IMAGE_FORMATS, variant_name
+from recipes.storage import recipe_image_storage
+
+BASE64_CHUNK_SIZE = 64 * 1024
 
 
 class Hex2NameColor(Field):
@@ -16,10 +29,53 @@ class Hex2NameColor(Field):
             raise ValidationError('Для этого цвета нет имени')
 
 
+def decode_base64(data):
+    decoded = SpooledTemporaryFile(max_size=settings.IMAGE_UPLOAD_MAX_MEMORY)
+    try:
+        for start in range(0, len(data), BASE64_CHUNK_SIZE):
+            decoded.write(
+                base64.b64decode(data[start:start + BASE64_CHUNK_SIZE])
+            )
+    except (binascii.Error, ValueError):
+        decoded.close()
+        raise ValidationError('Некорректное изображение')
+    decoded.seek(0)
+    return decoded
+
+
 class Base64ImageField(ImageField):
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
             ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = File(decode_base64(imgstr), name='temp.' + ext)
         return super().to_internal_value(data)
+
+
+class ImageVariantsField(ReadOnlyField):
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.has_image_variants:
+            return None
+        request = self.context.get('request')
+        return {
+            variant: {
+                extension: self.build_url(
+                    request,
+                    recipe_image_storage.url(
+                        variant_name(recipe.image.name, variant, extension)
+                    )
+                )
+                for extension in IMAGE_FORMATS
+            }
+            for variant in settings.IMAGE_VARIANTS
+        }
+
+    def build_url(self, request, url):
+        if request is None:
+            return url
+        return request.build_absolute_uri(url)
@@ -1,7 +1,9 @@
+from django.db.models import BooleanField, Case, Value, When
+from django.db.models.functions import Lower
 from django_filters import FilterSet
 from django_filters import rest_framework as filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
 from users.models import User
 
 
@@ -10,22 +12,50 @@ class RecipeFilter(FilterSet):
         field_name='tags__slug',
         queryset=Tag.objects.all(),
         to_field_name='slug',
+        method='filter_tags'
     )
     author = filters.ModelChoiceFilter(queryset=User.objects.all())
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'Популярные'), ('trending', 'В тренде')),
+        method='filter_ordering'
+    )
+
+    def filter_tags(self, queryset, name, tags):
+        if not tags:
+            return queryset
+        return queryset.filter(id__in=Recipe.tags.through.objects.filter(
+            tag__in=tags
+        ).values('recipe'))
 
     def filter_is_favorited(self, queryset, name, value):
         if value and not self.request.user.is_anonymous:
-            return queryset.filter(favorites__user=self.request.user)
+            return queryset.filter(id__in=Favorite.objects.filter(
+                user=self.request.user
+            ).values('recipe'))
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value and not self.request.user.is_anonymous:
-            return queryset.filter(shopping__user=self.request.user)
+            return queryset.filter(id__in=ShoppingCart.objects.filter(
+                user=self.request.user
+            ).values('recipe'))
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return queryset.search(value)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.filter(score__isnull=False).order_by(
+            f'-score__{value}', '-pub_date', '-id'
+        )
+
     class Meta:
         model = Recipe
         fields = ('tags', 'author')
@@ -33,7 +63,17 @@ class RecipeFilter(FilterSet):
 
 class IngredientSearchFilter(filters.FilterSet):
 
-    name = filters.CharFilter(lookup_expr='istartswith')
+    name = filters.CharFilter(method='filter_name')
+
+    def filter_name(self, queryset, name, value):
+        value = value.strip()
+        return queryset.filter(name__icontains=value).annotate(
+            is_prefix=Case(
+                When(name__istartswith=value, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField()
+            )
+        ).order_by('-is_prefix', Lower('name'), 'id')
 
     class Meta:
         model = Ingredient
@@ -0,0 +1,285 @@
+import base64
+import json
+import math
+import platform
+import statistics
+import time
+from collections import Counter
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.management.commands.generate_fixtures import FIXTURE_PASSWORD
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag
+)
+from users.models import Follow, User
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(values, rank):
+    values = sorted(values)
+    return values[max(math.ceil(rank / 100 * len(values)) - 1, 0)]
+
+
+def summary(timings, queries, statuses):
+    return {
+        'requests': len(timings),
+        'statuses': {str(code): count for code, count in statuses.items()},
+        'latency_ms': {
+            **{
+                f'p{rank}': round(percentile(timings, rank), 2)
+                for rank in PERCENTILES
+            },
+            'mean': round(statistics.mean(timings), 2),
+            'max': round(max(timings), 2),
+        },
+        'queries': {
+            'min': min(queries),
+            'mean': round(statistics.mean(queries), 2),
+            'max': max(queries),
+        },
+    }
+
+
+def step(name, method, path, data=None, client='user'):
+    return {
+        'name': name, 'method': method, 'path': path,
+        'data': data, 'client': client
+    }
+
+
+def created_path(response):
+    return f'/api/recipes/{response.data["id"]}/'
+
+
+def logout_headers(response):
+    return {'HTTP_AUTHORIZATION': f'Token {response.data["auth_token"]}'}
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержки и число SQL-запросов для каждого маршрута API '
+            'на данных generate_fixtures и сохраняет отчет в JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--output', default='benchmark_api.json')
+
+    def image(self):
+        image = BytesIO()
+        Image.new('RGB', (64, 64), '#C8A165').save(image, 'PNG')
+        return (
+            'data:image/png;base64,'
+            + base64.b64encode(image.getvalue()).decode()
+        )
+
+    def choose(self):
+        user = User.objects.filter(
+            username__startswith='fixture-'
+        ).order_by('id').first()
+        if user is None:
+            raise CommandError('Сначала выполните generate_fixtures')
+        recipes = Recipe.objects.exclude(author=user).exclude(
+            favorites__user=user
+        ).exclude(shopping__user=user).order_by('id')
+        recipe_ids = list(recipes.values_list('id', flat=True)[:5])
+        author = User.objects.exclude(id=user.id).exclude(
+            following__user=user
+        ).order_by('id').first()
+        if len(recipe_ids) < 5 or author is None:
+            raise CommandError('Недостаточно данных для замеров')
+        return user, author, recipe_ids
+
+    def recipe_payload(self, cooking_time):
+        return {
+            'name': 'benchmark recipe',
+            'text': 'Рецепт для замеров',
+            'cooking_time': cooking_time,
+            'image': self.image_data,
+            'tags': list(Tag.objects.values_list('id', flat=True)[:2]),
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 100}
+                for ingredient_id in Ingredient.objects.values_list(
+                    'id', flat=True
+                )[:5]
+            ],
+        }
+
+    def read_scenarios(self, user, author, recipe_ids):
+        recipe = recipe_ids[0]
+        ingredients = list(IngredientRecipe.objects.filter(
+            recipe_id=recipe
+        ).values_list('ingredient', flat=True))
+        tag = Tag.objects.order_by('id').first()
+        ingredient = Ingredient.objects.order_by('id').first()
+        return [
+            [step('users list', 'get', '/api/users/')],
+            [step('users detail', 'get', f'/api/users/{author.id}/')],
+            [step('users me', 'get', '/api/users/me/')],
+            [step('users subscriptions', 'get',
+                  '/api/users/subscriptions/', {'recipes_limit': 3})],
+            [step('tags list', 'get', '/api/tags/')],
+            [step('tags detail', 'get', f'/api/tags/{tag.id}/')],
+            [step('ingredients search', 'get', '/api/ingredients/',
+                  {'name': ingredient.name[:3]})],
+            [step('ingredients detail', 'get',
+                  f'/api/ingredients/{ingredient.id}/')],
+            [step('recipes list', 'get', '/api/recipes/')],
+            [step('recipes list anonymous', 'get', '/api/recipes/',
+                  client='anonymous')],
+            [step('recipes filtered', 'get', '/api/recipes/', {
+                'tags': tag.slug, 'is_favorited': 1,
+                'is_in_shopping_cart': 0
+            })],
+            [step('recipes by author', 'get', '/api/recipes/',
+                  {'author': author.id})],
+            [step('recipes search', 'get', '/api/recipes/',
+                  {'search': ingredient.name})],
+            [step('recipes popular', 'get', '/api/recipes/',
+                  {'ordering': 'popular'})],
+            [step('recipes detail', 'get', f'/api/recipes/{recipe}/')],
+            [step('recipes feed', 'get', '/api/recipes/feed/')],
+            [step('recipes similar', 'get',
+                  f'/api/recipes/{recipe}/similar/')],
+            [step('recipes what_to_cook', 'get', '/api/recipes/what_to_cook/',
+                  {'ingredients': ingredients})],
+            [step('download shopping cart', 'get',
+                  '/api/recipes/download_shopping_cart/')],
+        ]
+
+    def write_scenarios(self, user, author, recipe_ids):
+        recipe = recipe_ids[0]
+        batch = {'ids': recipe_ids}
+        scenarios = [
+            [
+                step('recipe create', 'post', '/api/recipes/',
+                     self.recipe_payload(10)),
+                step('recipe update', 'patch', created_path,
+                     self.recipe_payload(20)),
+                step('recipe delete', 'delete', created_path),
+            ],
+            [
+                step('subscribe', 'post',
+                     f'/api/users/{author.id}/subscribe/'),
+                step('unsubscribe', 'delete',
+                     f'/api/users/{author.id}/subscribe/'),
+            ],
+        ]
+        for action in ('favorite', 'shopping_cart'):
+            scenarios.append([
+                step(f'{action} add', 'post',
+                     f'/api/recipes/{recipe}/{action}/'),
+                step(f'{action} remove', 'delete',
+                     f'/api/recipes/{recipe}/{action}/'),
+            ])
+            scenarios.append([
+                step(f'{action} batch add', 'post',
+                     f'/api/recipes/{action}/', batch),
+                step(f'{action} batch remove', 'delete',
+                     f'/api/recipes/{action}/', batch),
+            ])
+        login = step('token login', 'post', '/api/auth/token/login/', {
+            'email': user.email, 'password': FIXTURE_PASSWORD
+        }, client='anonymous')
+        logout = step('token logout', 'post', '/api/auth/token/logout/',
+                      client=logout_headers)
+        scenarios.append([login, logout])
+        return scenarios
+
+    def request(self, clients, item, previous):
+        path = item['path']
+        if callable(path):
+            path = path(previous)
+        client, headers = item['client'], {}
+        if callable(client):
+            client, headers = 'anonymous', client(previous)
+        method = getattr(clients[client], item['method'])
+        if item['method'] == 'get':
+            return method(path, item['data'], **headers)
+        return method(path, item['data'], format='json', **headers)
+
+    def run(self, clients, scenario, results=None):
+        previous = None
+        for item in scenario:
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                previous = self.request(clients, item, previous)
+                if previous.streaming:
+                    b''.join(previous.streaming_content)
+                elapsed = (time.perf_counter() - started) * 1000
+            if results is not None:
+                timings, counts, statuses = results[item['name']]
+                timings.append(elapsed)
+                counts.append(len(queries))
+                statuses[previous.status_code] += 1
+
+    def measure(self, clients, scenarios, repeat, warmup):
+        results = {
+            item['name']: ([], [], Counter())
+            for scenario in scenarios for item in scenario
+        }
+        for scenario in scenarios:
+            for _ in range(warmup):
+                self.run(clients, scenario)
+            for _ in range(repeat):
+                self.run(clients, scenario, results)
+        return {
+            name: summary(*result) for name, result in results.items()
+        }
+
+    def handle(self, *args, **options):
+        user, author, recipe_ids = self.choose()
+        self.image_data = self.image()
+        token, _ = Token.objects.get_or_create(user=user)
+        clients = {'user': APIClient(), 'anonymous': APIClient()}
+        clients['user'].credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        scenarios = (
+            self.read_scenarios(user, author, recipe_ids)
+            + self.write_scenarios(user, author, recipe_ids)
+        )
+        endpoints = self.measure(
+            clients, scenarios, options['repeat'], options['warmup']
+        )
+        report = {
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'cache': settings.CACHES['default']['BACKEND'],
+            'repeat': options['repeat'],
+            'rows': {
+                model.__name__: model.objects.count()
+                for model in (
+                    User, Follow, Recipe, IngredientRecipe, Favorite,
+                    ShoppingCart
+                )
+            },
+            'endpoints': endpoints,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        for name, result in endpoints.items():
+            self.stdout.write(
+                f'{name:<28} p50 {result["latency_ms"]["p50"]:>8.1f} мс  '
+                f'p95 {result["latency_ms"]["p95"]:>8.1f} мс  '
+                f'запросов {result["queries"]["mean"]:>6.1f}  '
+                f'{result["statuses"]}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Отчет сохранен в {options["output"]}'
+        ))
@@ -0,0 +1,116 @@
+import heapq
+import statistics
+import time
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import RecipeViewSet
+from recipes.models import Recipe
+from users.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает ленту подписок через запросы по каждому автору, '
+            'полусоединение и кешированную ленту на синтетических данных')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--recipes-per-author', type=int, default=20)
+        parser.add_argument('--pages', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def generate(self, authors, recipes_per_author):
+        reader = User.objects.create(
+            username='benchmark-reader', email='reader@foodgram.local'
+        )
+        User.objects.bulk_create([
+            User(
+                username=f'benchmark-author-{i}',
+                email=f'author-{i}@foodgram.local'
+            )
+            for i in range(authors)
+        ])
+        authors = list(User.objects.filter(
+            username__startswith='benchmark-author-'
+        ))
+        Follow.objects.bulk_create([
+            Follow(user=reader, following=author) for author in authors
+        ])
+        Recipe.objects.bulk_create([
+            Recipe(
+                name=f'benchmark {author.id}-{i}', text='', author=author,
+                image='recipes/images/benchmark.png', cooking_time=10
+            )
+            for i in range(recipes_per_author)
+            for author in authors
+        ])
+        return reader, authors
+
+    def per_author(self, authors, page_size):
+        return list(heapq.merge(*(
+            Recipe.objects.filter(author=author).values_list(
+                'pub_date', 'id'
+            )[:page_size]
+            for author in authors
+        ), reverse=True))[:page_size]
+
+    def walk(self, reader, pages):
+        factory = APIRequestFactory()
+        view = RecipeViewSet.as_view({'get': 'feed'})
+        cursor = None
+        for _ in range(pages):
+            request = factory.get(
+                '/api/recipes/feed/', {'cursor': cursor} if cursor else {}
+            )
+            force_authenticate(request, user=reader)
+            response = view(request)
+            if response.data['next'] is None:
+                break
+            cursor = parse_qs(
+                urlparse(response.data['next']).query
+            )['cursor'][0]
+
+    def measure(self, callback, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            callback()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def report(self, title, callback, repeat):
+        self.stdout.write(
+            f'{title}: медиана {self.measure(callback, repeat):.1f} мс'
+        )
+
+    def handle(self, *args, **options):
+        repeat, pages = options['repeat'], options['pages']
+        with transaction.atomic():
+            reader, authors = self.generate(
+                options['authors'], options['recipes_per_author']
+            )
+            self.report(
+                'Запрос по каждому автору (первая страница)',
+                lambda: self.per_author(authors, 6), repeat
+            )
+            self.stdout.write(
+                Recipe.objects.feed_for(reader).order_by(
+                    '-pub_date', '-id'
+                )[:7].explain()
+            )
+            disabled = len(authors) + 1
+            with override_settings(FEED_TIMELINE_MIN_FOLLOWING=disabled):
+                self.report(
+                    f'Полусоединение ({pages} стр.)',
+                    lambda: self.walk(reader, pages), repeat
+                )
+            self.report(
+                f'Кешированная лента ({pages} стр.)',
+                lambda: self.walk(reader, pages), repeat
+            )
+            transaction.set_rollback(True)
+        self.stdout.write('Синтетические данные удалены')
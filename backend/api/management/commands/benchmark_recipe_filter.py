@@ -0,0 +1,95 @@
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import QueryDict
+
+from api.filters import RecipeFilter
+from recipes.models import Favorite, Recipe, Tag
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает фильтрацию рецептов по тегам и избранному через JOIN '
+            'и через подзапросы на синтетических данных')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def generate(self, recipes, tags, batch_size):
+        user = User.objects.create(
+            username='benchmark', email='benchmark@foodgram.local'
+        )
+        tags = Tag.objects.bulk_create([
+            Tag(name=f'benchmark-{i}', slug=f'benchmark-{i}', color='#000000')
+            for i in range(tags)
+        ])
+        tags = list(Tag.objects.filter(slug__startswith='benchmark-'))
+        for start in range(0, recipes, batch_size):
+            Recipe.objects.bulk_create([
+                Recipe(
+                    name=f'benchmark {i}', text='', author=user,
+                    image='recipes/images/benchmark.png', cooking_time=10
+                )
+                for i in range(start, min(start + batch_size, recipes))
+            ])
+        recipe_ids = list(
+            Recipe.objects.filter(author=user).values_list('id', flat=True)
+        )
+        through = Recipe.tags.through
+        links = [
+            through(recipe_id=recipe_id, tag_id=tag.id)
+            for recipe_id in recipe_ids
+            for tag in random.sample(tags, random.randint(1, 3))
+        ]
+        through.objects.bulk_create(links)
+        Favorite.objects.bulk_create([
+            Favorite(user=user, recipe_id=recipe_id)
+            for recipe_id in random.sample(recipe_ids, len(recipe_ids) // 10)
+        ])
+        return user, [tag.slug for tag in tags[:3]]
+
+    def measure(self, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            count = queryset.count()
+            list(queryset.values_list('id', flat=True)[:6])
+            timings.append((time.perf_counter() - started) * 1000)
+        return count, statistics.median(timings)
+
+    def report(self, title, queryset, repeat):
+        count, median = self.measure(queryset, repeat)
+        self.stdout.write(
+            f'{title}: {count} строк, медиана {median:.1f} мс'
+        )
+        self.stdout.write(queryset.explain())
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user, slugs = self.generate(
+                options['recipes'], options['tags'], options['batch_size']
+            )
+            legacy = Recipe.objects.filter(
+                tags__slug__in=slugs, favorites__user=user
+            )
+            data = QueryDict(mutable=True)
+            data.setlist('tags', slugs)
+            data['is_favorited'] = '1'
+            current = RecipeFilter(
+                data,
+                queryset=Recipe.objects.all(),
+                request=SimpleNamespace(user=user)
+            ).qs
+            self.report('JOIN', legacy, options['repeat'])
+            self.report('JOIN + DISTINCT', legacy.distinct(),
+                        options['repeat'])
+            self.report('Подзапросы', current, options['repeat'])
+            transaction.set_rollback(True)
+        self.stdout.write('Синтетические данные удалены')
@@ -0,0 +1,57 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from recipes.cache import bump_version
+
+URLS = (
+    '/api/tags/',
+    '/api/ingredients/',
+    '/api/ingredients/?name=мук',
+)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время ответа справочников (теги, ингредиенты) '
+            'с кешем и без него')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+
+    def measure(self, client, url, requests, **headers):
+        timings = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = client.get(url, **headers)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return response, (
+            statistics.mean(timings),
+            timings[len(timings) // 2],
+            timings[int(len(timings) * 0.95)],
+        )
+
+    def report(self, title, url, timings):
+        mean, median, p95 = timings
+        self.stdout.write(
+            f'{title:<14} {url:<32} mean {mean:7.2f} ms  '
+            f'p50 {median:7.2f} ms  p95 {p95:7.2f} ms'
+        )
+
+    def handle(self, *args, **options):
+        client = Client()
+        requests = options['requests']
+        for name in ('tags', 'ingredients'):
+            bump_version(name)
+        for url in URLS:
+            with override_settings(REFERENCE_CACHE_ENABLED=False):
+                _, timings = self.measure(client, url, requests)
+            self.report('без кеша', url, timings)
+            response, timings = self.measure(client, url, requests)
+            self.report('с кешем', url, timings)
+            response, timings = self.measure(
+                client, url, requests, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+            self.report(f'условный {response.status_code}', url, timings)
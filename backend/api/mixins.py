@@ -0,0 +1,140 @@
+import hashlib
+from math import ceil
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from .serializers import RecipeSerializer
+from recipes.cache import get_user_relations, get_version, get_versions
+from recipes.models import Recipe
+
+
+class CachedReferenceMixin:
+    cache_version_name = None
+
+    def get_cache_key(self, request, version):
+        query = '&'.join(
+            f'{key}={value}'
+            for key, values in sorted(request.query_params.lists())
+            for value in values
+        )
+        return 'reference:' + hashlib.md5(
+            f'{self.cache_version_name}:{version}:{self.action}:'
+            f'{self.kwargs.get(self.lookup_field, "")}:{query}'.encode()
+        ).hexdigest()
+
+    def cached(self, request, view, *args, **kwargs):
+        if not settings.REFERENCE_CACHE_ENABLED:
+            return view(request, *args, **kwargs)
+        version = get_version(self.cache_version_name)
+        key = self.get_cache_key(request, version)
+        etag = quote_etag(key.split(':')[1])
+        last_modified = ceil(version)
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+        data = cache.get(key)
+        if data is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            data = response.data
+            cache.set(key, data, settings.REFERENCE_CACHE_TIMEOUT)
+        response = Response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(request, self.uncached_list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(request, super().retrieve, *args, **kwargs)
+
+    def uncached_list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+class CachedRecipeMixin:
+
+    def get_representations(self, recipes):
+        versions = get_versions({
+            'tags', 'ingredients',
+            *(f'recipe:{recipe.id}' for recipe in recipes),
+            *(f'user:{recipe.author_id}' for recipe in recipes),
+        })
+        keys = {
+            recipe.id: 'recipe:' + ':'.join(map(str, (
+                recipe.id,
+                versions[f'recipe:{recipe.id}'],
+                versions[f'user:{recipe.author_id}'],
+                versions['tags'],
+                versions['ingredients'],
+            )))
+            for recipe in recipes
+        }
+        representations = cache.get_many(keys.values())
+        missing = [
+            recipe_id for recipe_id, key in keys.items()
+            if key not in representations
+        ]
+        if missing:
+            fresh = {
+                keys[item['id']]: item
+                for item in RecipeSerializer(
+                    Recipe.objects.with_related(AnonymousUser()).filter(
+                        id__in=missing
+                    ),
+                    many=True,
+                    context=self.get_serializer_context()
+                ).data
+            }
+            cache.set_many(fresh, settings.RECIPE_CACHE_TIMEOUT)
+            representations.update(fresh)
+        return [representations[keys[recipe.id]] for recipe in recipes]
+
+    def add_user_flags(self, representations):
+        user = self.request.user
+        if user.is_anonymous:
+            favorites = shopping = following = frozenset()
+        else:
+            favorites, shopping, following = get_user_relations(user)
+        return [
+            {
+                **item,
+                'author': {
+                    **item['author'],
+                    'is_subscribed': item['author']['id'] in following
+                },
+                'is_favorited': item['id'] in favorites,
+                'is_in_shopping_cart': item['id'] in shopping,
+            }
+            for item in representations
+        ]
+
+    def list(self, request, *args, **kwargs):
+        if not settings.RECIPE_CACHE_ENABLED:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        data = self.add_user_flags(self.get_representations(
+            list(queryset) if page is None else page
+        ))
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.RECIPE_CACHE_ENABLED:
+            return super().retrieve(request, *args, **kwargs)
+        return Response(self.add_user_flags(
+            self.get_representations([self.get_object()])
+        )[0])
@@ -1,7 +1,134 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from recipes.cache import get_version
+from recipes.models import Recipe
+
+
+class CachedCountPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        try:
+            sql, params = self.object_list.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        key = 'count:' + hashlib.md5(
+            f'{get_version("recipes")}:{sql}:{params!r}'.encode()
+        ).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
 
 
 class CustomPagination(PageNumberPagination):
 
+    django_paginator_class = CachedCountPaginator
+    page_size_query_param = 'limit'
+    page_size = 6
+
+
+class RecipeKeysetPagination(BasePagination):
+
+    cursor_query_param = 'cursor'
     page_size_query_param = 'limit'
     page_size = 6
+    max_page_size = 100
+    invalid_cursor_message = 'Неверный курсор'
+
+    def encode_cursor(self, recipe):
+        return urlsafe_b64encode(
+            f'{recipe.pub_date.isoformat()}|{recipe.id}'.encode()
+        ).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            pub_date, pk = urlsafe_b64decode(
+                cursor.encode()
+            ).decode().split('|')
+            pub_date = parse_datetime(pub_date)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return pub_date, pk
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_page(self, results, page_size):
+        self.next_cursor = (
+            self.encode_cursor(results[page_size - 1])
+            if len(results) > page_size else None
+        )
+        return results[:page_size]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by('-pub_date', '-id')
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            pub_date, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk)
+            )
+        return self.get_page(list(queryset[:page_size + 1]), page_size)
+
+    def paginate_timeline(self, timeline, request, complete):
+        self.request = request
+        page_size = self.get_page_size(request)
+        start = 0
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            position = self.decode_cursor(cursor)
+            start = next((
+                index for index, (pub_date, pk, _) in enumerate(timeline)
+                if (pub_date, pk) < position
+            ), len(timeline))
+        entries = timeline[start:start + page_size + 1]
+        if len(entries) <= page_size and not complete:
+            return None
+        return self.get_page([
+            Recipe(id=pk, pub_date=pub_date, author_id=author_id)
+            for pub_date, pk, author_id in entries
+        ], page_size)
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ]))
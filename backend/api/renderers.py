@@ -0,0 +1,105 @@
+import csv
+import os
+from io import BytesIO
+from itertools import islice
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import BaseRenderer
+
+
+class Echo:
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(BaseRenderer):
+    charset = 'utf-8'
+
+    def stream(self, ingredients):
+        raise NotImplementedError
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        chunks = self.stream(data)
+        return b''.join(
+            chunk.encode(self.charset) if isinstance(chunk, str) else chunk
+            for chunk in chunks
+        )
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield '\ufeff'
+        for item in ingredients:
+            yield writer.writerow(item)
+
+
+class TXTShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients):
+        for name, measurement_unit, amount in ingredients:
+            yield f'{name} ({measurement_unit}) - {amount}\n'
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    font_size = 12
+    leading = 18
+    margin = 50
+
+    def get_font(self):
+        font_path = settings.SHOPPING_LIST_PDF_FONT
+        if not os.path.exists(font_path):
+            return 'Helvetica'
+        font_name = os.path.splitext(os.path.basename(font_path))[0]
+        if font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(font_name, font_path))
+        return font_name
+
+    def stream(self, ingredients):
+        buffer = BytesIO()
+        font = self.get_font()
+        width, height = A4
+        document = canvas.Canvas(buffer, pagesize=A4)
+        document.setFont(font, self.font_size + 4)
+        document.drawString(
+            self.margin, height - self.margin, 'Список покупок'
+        )
+        position = height - self.margin - 2 * self.leading
+        document.setFont(font, self.font_size)
+        ingredients = iter(ingredients)
+        lines = [
+            f'• {name} ({measurement_unit}) — {amount}'
+            for name, measurement_unit, amount in islice(
+                ingredients, settings.SHOPPING_LIST_PDF_MAX_ROWS
+            )
+        ]
+        skipped = sum(1 for _ in ingredients)
+        if skipped:
+            lines.append(
+                f'… и еще позиций: {skipped}, полный список доступен в CSV'
+            )
+        for line in lines:
+            if position < self.margin:
+                document.showPage()
+                document.setFont(font, self.font_size)
+                position = height - self.margin
+            document.drawString(self.margin, position, line)
+            position -= self.leading
+        document.save()
+        buffer.seek(0)
+        yield from iter(
+            lambda: buffer.read(settings.SHOPPING_LIST_CHUNK_SIZE), b''
+        )
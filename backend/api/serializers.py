@@ -1,21 +1,24 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework import exceptions
 from djoser.serializers import UserSerializer, UserCreateSerializer
 from rest_framework import serializers
 from rest_framework.relations import SlugRelatedField
-from rest_framework.serializers import (
-    ModelSerializer,
-    SerializerMethodField,
-    ValidationError
-)
-from rest_framework.validators import UniqueTogetherValidator
-
-from .fields import Base64ImageField
+from rest_framework.serializers import ModelSerializer, SerializerMethodField
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import access_token_for, is_revoked
+from .fields import Base64ImageField, ImageVariantsField
+from recipes.images import schedule_image_variants
 from recipes.models import (
     Favorite,
     Ingredient,
     IngredientRecipe,
     Recipe,
     ShoppingCart,
+    ShoppingListItem,
     Tag
 )
 from users.models import Follow, User
@@ -45,6 +48,8 @@ class UserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -100,6 +105,7 @@ class RecipeSerializer(ModelSerializer):
         source='ingredients_recipe'
     )
     image = Base64ImageField(use_url=True)
+    image_variants = ImageVariantsField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -114,11 +120,14 @@ class RecipeSerializer(ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time'
         )
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -128,6 +137,8 @@ class RecipeSerializer(ModelSerializer):
         ).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -138,14 +149,15 @@ class RecipeSerializer(ModelSerializer):
 
 
 class CreateResponseSerializer(ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
 class FollowListSerializer(UserSerializer):
     recipes = CreateResponseSerializer(many=True, read_only=True)
-    recipes_count = SerializerMethodField()
     is_subscribed = SerializerMethodField(read_only=True)
 
     class Meta:
@@ -155,38 +167,6 @@ class FollowListSerializer(UserSerializer):
             'is_subscribed', 'recipes', 'recipes_count'
         )
 
-    def get_recipes_count(self, object):
-        return object.recipes.count()
-
-
-class FollowSerializer(ModelSerializer):
-
-    def validate_following(self, following):
-        user = self.context.get('request').user
-        if user == following:
-            raise ValidationError(
-                'Нельзя подписаться на самого себя'
-            )
-        return following
-
-    class Meta:
-        model = Follow
-        fields = ('user', 'following')
-
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Follow.objects.all(),
-                fields=('user', 'following'),
-                message='Вы уже подписаны'
-            )
-        ]
-
-    def to_representation(self, instance):
-        return FollowListSerializer(
-            instance.following,
-            context={'request': self.context.get('request')}
-        ).data
-
 
 class CreateIngredientRecipeSerializer(ModelSerializer):
     id = serializers.IntegerField(write_only=True)
@@ -255,18 +235,56 @@ class CreateRecipeSerializer(ModelSerializer):
                 raise exceptions.ValidationError(
                     'Укажите количество ингредиентов'
                 )
+        existing = Ingredient.objects.in_bulk(current_ingredients)
+        if len(existing) != len(current_ingredients):
+            raise exceptions.ValidationError(
+                'Такого ингредиента не существует'
+            )
         return ingredients
 
     def create_ingredients(self, ingredients, recipe):
         IngredientRecipe.objects.bulk_create([
             IngredientRecipe(
-                ingredient=Ingredient.objects.get(id=ingredient.get('id')),
+                ingredient_id=ingredient.get('id'),
                 recipe=recipe,
                 amount=ingredient.get('amount')
             )
             for ingredient in ingredients
         ])
 
+    def update_ingredients(self, ingredients, recipe):
+        current = {
+            item.ingredient_id: item
+            for item in recipe.ingredients_recipe.all()
+        }
+        old_amounts = {
+            ingredient: item.amount for ingredient, item in current.items()
+        }
+        amounts = {
+            ingredient.get('id'): ingredient.get('amount')
+            for ingredient in ingredients
+        }
+        removed = current.keys() - amounts.keys()
+        if removed:
+            IngredientRecipe.objects.filter(
+                recipe=recipe, ingredient__in=removed
+            ).delete()
+        changed = []
+        for ingredient, item in current.items():
+            if ingredient in amounts and item.amount != amounts[ingredient]:
+                item.amount = amounts[ingredient]
+                changed.append(item)
+        IngredientRecipe.objects.bulk_update(changed, ['amount'])
+        self.create_ingredients(
+            [
+                ingredient for ingredient in ingredients
+                if ingredient.get('id') not in current
+            ],
+            recipe
+        )
+        return old_amounts, amounts
+
+    @transaction.atomic
     def create(self, validated_data):
         validated_data['author'] = self.context['request'].user
         ingredients_data = validated_data.pop('ingredients')
@@ -275,34 +293,78 @@ class CreateRecipeSerializer(ModelSerializer):
         new_recipe.tags.set(tags_data)
         self.create_ingredients(ingredients=ingredients_data,
                                 recipe=new_recipe)
+        schedule_image_variants(new_recipe)
         return new_recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         super().update(instance, validated_data)
-        instance.tags.clear()
-        instance.ingredients.clear()
         instance.tags.set(tags)
-        IngredientRecipe.objects.filter(recipe=instance).delete()
-        self.create_ingredients(ingredients, instance)
+        old_amounts, new_amounts = self.update_ingredients(
+            ingredients, instance
+        )
+        ShoppingListItem.objects.change_recipe(
+            instance, old_amounts, new_amounts
+        )
+        schedule_image_variants(instance)
         return instance
 
     def to_representation(self, instance):
-        return RecipeSerializer(instance, context=self.context).data
+        return RecipeSerializer(
+            Recipe.objects.with_related(
+                self.context.get('request').user
+            ).get(pk=instance.pk),
+            context=self.context
+        ).data
 
 
 class FavoriteSerializer(ModelSerializer):
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPE_BATCH_MAX_SIZE
+    )
+
+
+class IngredientIdsSerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPE_BATCH_MAX_SIZE
+    )
+
+
+class TokenRefreshSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+    def validate(self, data):
+        try:
+            refresh = RefreshToken(data['refresh'])
+        except TokenError:
+            raise exceptions.ValidationError('Недействительный токен')
+        if is_revoked(refresh, refresh['jti'], local=False):
+            raise exceptions.ValidationError('Токен отозван')
+        user = User.objects.filter(
+            id=refresh[api_settings.USER_ID_CLAIM], is_active=True
+        ).first()
+        if user is None:
+            raise exceptions.ValidationError('Пользователь не найден')
+        return {'auth_token': str(access_token_for(user, refresh['jti']))}
 
 
 class SubscriptionShowSerializer(UserSerializer):
     recipes = SerializerMethodField()
-    recipes_count = SerializerMethodField()
 
     class Meta:
         model = User
@@ -318,11 +380,14 @@ class SubscriptionShowSerializer(UserSerializer):
         )
 
     def get_recipes(self, object):
-        recipes_limit = self.context.get('recipes_limit')
-        author_recipes = object.recipes.all()[:int(recipes_limit)]
+        recipes_by_author = self.context.get('recipes_by_author')
+        if recipes_by_author is not None:
+            author_recipes = recipes_by_author.get(object.id, [])
+        else:
+            author_recipes = object.recipes.all()
+            recipes_limit = self.context.get('recipes_limit')
+            if recipes_limit is not None:
+                author_recipes = author_recipes[:recipes_limit]
         return CreateResponseSerializer(
             author_recipes, many=True
         ).data
-
-    def get_recipes_count(self, object):
-        return object.recipes.count()
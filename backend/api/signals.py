@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import revoke_user, token_cache
+from users.models import User
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    key = instance.key
+    transaction.on_commit(lambda: token_cache.invalidate([key]))
+
+
+REVOKING_USER_FIELDS = ('password', 'is_active', 'is_staff', 'is_superuser')
+
+
+def revoking_changes(instance, previous):
+    loaded = set(previous) - instance.get_deferred_fields()
+    return any(getattr(instance, field) != previous[field] for field in loaded)
+
+
+@receiver(pre_save, sender=User)
+def remember_revoking_fields(sender, instance, update_fields, **kwargs):
+    instance._revoking_fields = None
+    if not settings.AUTH_STATELESS or instance._state.adding:
+        return
+    fields = [
+        field for field in REVOKING_USER_FIELDS
+        if update_fields is None or field in update_fields
+    ]
+    if fields:
+        instance._revoking_fields = User.objects.filter(
+            pk=instance.pk
+        ).values(*fields).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    if created:
+        return
+    previous = getattr(instance, '_revoking_fields', None)
+    if previous and revoking_changes(instance, previous):
+        user_id = instance.id
+        transaction.on_commit(lambda: revoke_user(user_id))
+    keys = list(Token.objects.filter(user=instance).values_list(
+        'key', flat=True
+    ))
+    if keys:
+        transaction.on_commit(lambda: token_cache.invalidate(keys))
+
+
+@receiver(post_migrate)
+def create_cache_tables(sender, app_config, using, **kwargs):
+    if app_config.label == 'authtoken':
+        call_command('createcachetable', database=using, verbosity=0)
@@ -3,9 +3,12 @@ from rest_framework import routers
 
 from .views import (
     CustomTokenCreateView,
+    CustomTokenDestroyView,
     IngredientViewSet,
     RecipeViewSet,
     TagViewSet,
+    TokenCacheStatsView,
+    TokenRefreshView,
     UsersViewSet
 )
 
@@ -23,5 +26,12 @@ urlpatterns = [
     re_path(r"^auth/token/login/?$",
             CustomTokenCreateView.as_view(),
             name="login"),
+    re_path(r"^auth/token/logout/?$",
+            CustomTokenDestroyView.as_view(),
+            name="logout"),
+    path('auth/token/refresh/', TokenRefreshView.as_view(),
+         name='token_refresh'),
+    path('auth/token/stats/', TokenCacheStatsView.as_view(),
+         name='token_stats'),
     path('auth/', include('djoser.urls.authtoken')),
 ]
@@ -1,17 +1,66 @@
-from django.conf import settings
-from django.http import HttpResponse
-
-
-def convert_txt(shop_list):
-    file_name = settings.SHOPPING_LIST_FILE_NAME
-    lines = []
-    for ing in shop_list:
-        name = ing['ingredient__name']
-        measurement_unit = ing['ingredient__measurement_unit']
-        amount = ing['ingredient_total']
-        lines.append(f'{name} ({measurement_unit}) - {amount}')
-    content = '\n'.join(lines)
-    content_type = 'text/plain,charset=utf8'
-    response = HttpResponse(content, content_type=content_type)
-    response['Content-Disposition'] = f'attachment; filename={file_name}'
-    return response
+from django.db import connection
+from django.utils import timezone
+
+
+def _link_columns(model, owner_field, target_field):
+    quote = connection.ops.quote_name
+    meta = model._meta
+    return (
+        quote(meta.db_table),
+        quote(meta.get_field(owner_field).column),
+        quote(meta.get_field(target_field).column)
+    )
+
+
+def _timestamp_columns(model):
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    return {
+        connection.ops.quote_name(field.column): now
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    }
+
+
+def insert_links(model, owner_field, owner_id, target_field, target_ids):
+    if not target_ids:
+        return []
+    quote = connection.ops.quote_name
+    table, owner, target = _link_columns(model, owner_field, target_field)
+    target_meta = model._meta.get_field(target_field).related_model._meta
+    target_pk = quote(target_meta.pk.column)
+    timestamps = _timestamp_columns(model)
+    columns = ''.join(f', {column}' for column in timestamps)
+    values = ', %s' * len(timestamps)
+    placeholders = ', '.join(['%s'] * len(target_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({owner}, {target}{columns}) '
+            f'SELECT %s, {target_pk}{values} '
+            f'FROM {quote(target_meta.db_table)} '
+            f'WHERE {target_pk} IN ({placeholders}) '
+            f'ON CONFLICT DO NOTHING RETURNING {target}',
+            [owner_id, *timestamps.values(), *target_ids]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def insert_link(model, owner_field, owner_id, target_field, target_id):
+    return bool(insert_links(
+        model, owner_field, owner_id, target_field, [target_id]
+    ))
+
+
+def delete_links(model, owner_field, owner_id, target_field, target_ids):
+    if not target_ids:
+        return []
+    table, owner, target = _link_columns(model, owner_field, target_field)
+    placeholders = ', '.join(['%s'] * len(target_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} '
+            f'WHERE {owner} = %s AND {target} IN ({placeholders}) '
+            f'RETURNING {target}',
+            [owner_id, *target_ids]
+        )
+        return [row[0] for row in cursor.fetchall()]
@@ -1,37 +1,66 @@
-import csv
+from collections import defaultdict
 
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models import BooleanField, Value
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser import utils, views
-from djoser.conf import settings
+from djoser.conf import settings as djoser_settings
 from djoser.views import UserViewSet
 from rest_framework import permissions, status
 from rest_framework.decorators import action
 from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
+from .authentication import issue_tokens, revoke_session, token_cache
 from .filters import IngredientSearchFilter, RecipeFilter
-from .paginations import CustomPagination
+from .mixins import CachedRecipeMixin, CachedReferenceMixin
+from .paginations import CustomPagination, RecipeKeysetPagination
 from .permissions import IsAuthorOrReadOnly
+from .renderers import (
+    CSVShoppingListRenderer,
+    PDFShoppingListRenderer,
+    ShoppingListRenderer,
+    TXTShoppingListRenderer
+)
 from .serializers import (
     CreateRecipeSerializer,
     FavoriteSerializer,
-    FollowSerializer,
+    FollowListSerializer,
+    IngredientIdsSerializer,
     IngredientSerializer,
+    RecipeIdsSerializer,
     RecipeSerializer,
     SubscriptionShowSerializer,
-    TagSerializer
+    TagSerializer,
+    TokenRefreshSerializer
+)
+from .utils import delete_links, insert_link, insert_links
+from recipes.cache import (
+    get_feed_timeline,
+    get_user_relations,
+    invalidate_user_relations
+)
+from recipes.counters import update_counter
+from recipes.indexes import (
+    get_similar_recipes,
+    ingredient_name_index,
+    recipe_feature_index
 )
 from recipes.models import (
     Favorite,
     Ingredient,
-    IngredientRecipe,
     Recipe,
     ShoppingCart,
+    ShoppingListItem,
     Tag
 )
 from users.models import Follow, User
@@ -40,49 +69,121 @@ from users.models import Follow, User
 class CustomTokenCreateView(views.TokenCreateView):
 
     def _action(self, serializer):
+        if settings.AUTH_STATELESS:
+            return self.stateless_action(serializer.user)
         super()._action(serializer)
         token = utils.login_user(self.request, serializer.user)
-        token_serializer_class = settings.SERIALIZERS.token
+        token_serializer_class = djoser_settings.SERIALIZERS.token
         return Response(
             data=token_serializer_class(token).data,
             status=status.HTTP_201_CREATED
         )
 
+    def stateless_action(self, user):
+        user_logged_in.send(
+            sender=user.__class__, request=self.request, user=user
+        )
+        access, refresh = issue_tokens(user)
+        return Response(
+            data={'auth_token': str(access), 'refresh_token': str(refresh)},
+            status=status.HTTP_201_CREATED
+        )
+
+
+class CustomTokenDestroyView(views.TokenDestroyView):
+
+    def post(self, request):
+        if not isinstance(request.auth, AccessToken):
+            return super().post(request)
+        revoke_session(request.auth['sid'])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TokenRefreshView(APIView):
+    authentication_classes = ()
+    permission_classes = (permissions.AllowAny, )
+
+    def post(self, request):
+        serializer = TokenRefreshSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.validated_data)
+
+
+class TokenCacheStatsView(APIView):
+    permission_classes = (permissions.IsAdminUser, )
+
+    def get(self, request):
+        return Response(token_cache.stats())
+
+
+class TagViewSet(CachedReferenceMixin, ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    cache_version_name = 'tags'
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(CachedReferenceMixin, ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    cache_version_name = 'ingredients'
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientSearchFilter
 
+    def uncached_list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None or not settings.INGREDIENT_SEARCH_IN_MEMORY:
+            return super().uncached_list(request, *args, **kwargs)
+        return Response(ingredient_name_index.search(name))
+
 
 class UsersViewSet(UserViewSet):
     pagination_class = LimitOffsetPagination
 
+    def get_instance(self):
+        user = super().get_instance()
+        deferred = user.get_deferred_fields()
+        if deferred:
+            user.refresh_from_db(fields=deferred)
+        return user
+
     @action(
         methods=['get'],
         detail=False,
     )
     def subscriptions(self, request):
 
-        recipes_limit = request.query_params['recipes_limit']
-        authors = User.objects.filter(following__user=request.user)
+        recipes_limit = request.query_params.get('recipes_limit')
+        recipes_limit = (
+            int(recipes_limit)
+            if recipes_limit and recipes_limit.isdigit() else None
+        )
+        authors = User.objects.filter(
+            following__user=request.user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        )
         result_pages = self.paginate_queryset(
             queryset=authors
         )
+        page_authors = (
+            list(authors) if result_pages is None else result_pages
+        )
+        recipes_by_author = defaultdict(list)
+        for recipe in Recipe.objects.latest_for_authors(
+            page_authors, recipes_limit
+        ):
+            recipes_by_author[recipe.author_id].append(recipe)
         serializer = SubscriptionShowSerializer(
-            result_pages,
+            page_authors,
             context={
                 'request': request,
-                'recipes_limit': recipes_limit
+                'recipes_limit': recipes_limit,
+                'recipes_by_author': recipes_by_author
             },
             many=True
         )
+        if result_pages is None:
+            return Response(serializer.data)
         return self.get_paginated_response(serializer.data)
 
     @action(
@@ -90,33 +191,41 @@ class UsersViewSet(UserViewSet):
         detail=True,
     )
     def subscribe(self, request, id):
-
+        user = request.user
+        if not str(id).isdigit():
+            raise Http404
         if request.method != 'POST':
-            subscription = Follow.objects.filter(
-                user=request.user,
-                following=get_object_or_404(User, id=id)
-            )
-            if subscription.exists():
-                self.perform_destroy(subscription)
+            deleted = delete_links(Follow, 'user', user.id, 'following', [id])
+            if deleted:
+                update_counter(Follow, deleted, -1)
+                invalidate_user_relations(user.id)
                 return Response(status=status.HTTP_204_NO_CONTENT)
+            get_object_or_404(User, id=id)
             return Response(
                 {'errors': 'Вы уже отписаны'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        serializer = FollowSerializer(
-            data={
-                'user': request.user.id,
-                'following': get_object_or_404(User, id=id).id
-            },
+        if int(id) == user.id:
+            return Response(
+                {'errors': 'Нельзя подписаться на самого себя'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not insert_link(Follow, 'user', user.id, 'following', id):
+            get_object_or_404(User, id=id)
+            return Response(
+                {'errors': 'Вы уже подписаны'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        update_counter(Follow, [id], 1)
+        invalidate_user_relations(user.id)
+        serializer = FollowListSerializer(
+            User.objects.get(id=id),
             context={'request': request}
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class RecipeViewSet(ModelViewSet):
-    queryset = Recipe.objects.all()
+class RecipeViewSet(CachedRecipeMixin, ModelViewSet):
     permission_classes = (
         permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly
     )
@@ -124,6 +233,21 @@ class RecipeViewSet(ModelViewSet):
     filterset_class = RecipeFilter
     filter_backends = [DjangoFilterBackend, ]
 
+    def get_queryset(self):
+        if (self.action in ('list', 'retrieve')
+                and settings.RECIPE_CACHE_ENABLED):
+            return Recipe.objects.only('id', 'author', 'pub_date')
+        return Recipe.objects.with_related(self.request.user)
+
+    @property
+    def paginator(self):
+        query_params = self.request.query_params
+        if (self.action == 'list'
+                and query_params.get('cursor') is not None
+                and query_params.get('ordering') is None):
+            self.pagination_class = RecipeKeysetPagination
+        return super().paginator
+
     def get_serializer_class(self):
 
         if self.request.method in SAFE_METHODS:
@@ -133,27 +257,41 @@ class RecipeViewSet(ModelViewSet):
     def add_delete_recipe_from_favorite_or_list(self, request,
                                                 pk, model, recipe_model):
         user = request.user
-        recipe = get_object_or_404(recipe_model, id=pk)
+        if not str(pk).isdigit():
+            raise Http404
         if request.method == 'POST':
-            if model.objects.filter(user=user,
-                                    recipe=recipe).exists():
+            with transaction.atomic():
+                created = insert_link(model, 'user', user.id, 'recipe', pk)
+                if created:
+                    update_counter(model, [pk], 1)
+                    recipe = recipe_model.objects.get(id=pk)
+                    invalidate_user_relations(user.id)
+                    if model is ShoppingCart:
+                        ShoppingListItem.objects.add_recipes(user, [recipe])
+            if not created:
+                recipe = get_object_or_404(recipe_model, id=pk)
                 return Response(
                     {'errors': f'{recipe.name} уже добавили'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            model.objects.create(user=user, recipe=recipe),
             return Response(
                 FavoriteSerializer(recipe).data,
                 status=status.HTTP_201_CREATED
             )
         if request.method == 'DELETE':
-            if not model.objects.filter(user=user,
-                                        recipe=recipe).exists():
+            with transaction.atomic():
+                deleted = delete_links(model, 'user', user.id, 'recipe', [pk])
+                if deleted:
+                    update_counter(model, deleted, -1)
+                    invalidate_user_relations(user.id)
+                    if model is ShoppingCart:
+                        ShoppingListItem.objects.remove_recipes(user, [pk])
+            if not deleted:
+                recipe = get_object_or_404(recipe_model, id=pk)
                 return Response(
                     {'errors': f'Нет такого рецепта {recipe.name}'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            model.objects.filter(user=user, recipe=recipe).delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -178,28 +316,205 @@ class RecipeViewSet(ModelViewSet):
             recipe_model=Recipe
         )
 
+    def add_delete_recipes_from_favorite_or_list(self, request, model):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        user = request.user
+        with transaction.atomic():
+            if request.method == 'POST':
+                changed = insert_links(model, 'user', user.id, 'recipe', ids)
+                statuses, sign = ('added', 'exists'), 1
+            else:
+                changed = delete_links(model, 'user', user.id, 'recipe', ids)
+                statuses, sign = ('removed', 'absent'), -1
+            if changed:
+                update_counter(model, changed, sign)
+                invalidate_user_relations(user.id)
+                if model is ShoppingCart:
+                    ShoppingListItem.objects.add_recipes(user, changed, sign)
+        changed = set(changed)
+        unchanged = [id for id in ids if id not in changed]
+        found = set(Recipe.objects.filter(
+            id__in=unchanged
+        ).values_list('id', flat=True)) if unchanged else set()
+        return Response([
+            {
+                'id': id,
+                'status': (
+                    statuses[0] if id in changed
+                    else statuses[1] if id in found
+                    else 'not_found'
+                )
+            }
+            for id in ids
+        ])
+
+    @action(
+        ['post', 'delete'],
+        detail=False,
+        url_path='favorite',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def favorite_batch(self, request):
+        return self.add_delete_recipes_from_favorite_or_list(
+            request=request, model=Favorite
+        )
+
+    @action(
+        ['post', 'delete'],
+        detail=False,
+        url_path='shopping_cart',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def shopping_cart_batch(self, request):
+        return self.add_delete_recipes_from_favorite_or_list(
+            request=request, model=ShoppingCart
+        )
+
+    def get_page_representations(self, recipes):
+        if settings.RECIPE_CACHE_ENABLED:
+            return self.add_user_flags(self.get_representations(recipes))
+        loaded = Recipe.objects.with_related(self.request.user).in_bulk(
+            [recipe.id for recipe in recipes]
+        )
+        return RecipeSerializer(
+            [loaded[recipe.id] for recipe in recipes],
+            many=True,
+            context=self.get_serializer_context()
+        ).data
+
     @action(
         detail=False,
         methods=['get'],
         permission_classes=(permissions.IsAuthenticated,)
     )
-    def download_shopping_cart(self, request):
+    def feed(self, request):
+        user = request.user
+        paginator = RecipeKeysetPagination()
+        _, _, following = get_user_relations(user)
+        timeline = get_feed_timeline(user, following)
+        page = None
+        if timeline is not None:
+            page = paginator.paginate_timeline(
+                timeline, request,
+                complete=len(timeline) < settings.FEED_TIMELINE_SIZE
+            )
+        if page is None:
+            page = paginator.paginate_queryset(
+                Recipe.objects.feed_for(user).only('id', 'author', 'pub_date'),
+                request,
+                view=self
+            )
+        return paginator.get_paginated_response(
+            self.get_page_representations(page)
+        )
 
-        user = self.request.user
-        if user.is_anonymous:
-            return Response(status=status.HTTP_401_UNAUTHORIZED)
-        ingredients = IngredientRecipe.objects.filter(
-            recipe__shopping__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(ingredient_amount=Sum('amount')).values_list(
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk):
+        if not str(pk).isdigit():
+            raise Http404
+        recipe = get_object_or_404(Recipe.objects.only('id'), id=pk)
+        limit = request.query_params.get('limit')
+        limit = (
+            min(int(limit), settings.SIMILAR_RECIPES_MAX_LIMIT)
+            if limit and limit.isdigit() else settings.SIMILAR_RECIPES_LIMIT
+        )
+        neighbours = get_similar_recipes(recipe.id)[:limit]
+        recipes = Recipe.objects.only('id', 'author', 'pub_date').in_bulk(
+            [pk for pk, _ in neighbours]
+        )
+        neighbours = [
+            (pk, similarity) for pk, similarity in neighbours
+            if pk in recipes
+        ]
+        return Response([
+            {**representation, 'similarity': similarity}
+            for (_, similarity), representation in zip(
+                neighbours,
+                self.get_page_representations(
+                    [recipes[pk] for pk, _ in neighbours]
+                )
+            )
+        ])
+
+    @action(detail=False, methods=['get'])
+    def what_to_cook(self, request):
+        serializer = IngredientIdsSerializer(data={
+            'ingredients': request.query_params.getlist('ingredients')
+        })
+        serializer.is_valid(raise_exception=True)
+        matches = recipe_feature_index.search(
+            serializer.validated_data['ingredients']
+        )
+        page = self.paginate_queryset(matches)
+        if page is None:
+            page = matches[:]
+        recipes = Recipe.objects.only('id', 'author', 'pub_date').in_bulk(
+            [match['id'] for match in page]
+        )
+        page = [match for match in page if match['id'] in recipes]
+        ingredients = Ingredient.objects.in_bulk({
+            pk for match in page for pk in match['missing']
+        })
+        data = [
+            {
+                **representation,
+                'coverage': match['coverage'],
+                'missing': IngredientSerializer(
+                    [
+                        ingredients[pk] for pk in match['missing']
+                        if pk in ingredients
+                    ],
+                    many=True
+                ).data,
+            }
+            for match, representation in zip(
+                page,
+                self.get_page_representations(
+                    [recipes[match['id']] for match in page]
+                )
+            )
+        ]
+        if self.paginator is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=(permissions.IsAuthenticated,),
+        renderer_classes=(
+            CSVShoppingListRenderer,
+            TXTShoppingListRenderer,
+            PDFShoppingListRenderer
+        )
+    )
+    def download_shopping_cart(self, request):
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user
+        ).values_list(
             'ingredient__name', 'ingredient__measurement_unit',
-            'ingredient_amount')
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = ('attachment;'
-                                           'filename="Shoppinglist.csv"')
-        response.write(u'\ufeff'.encode('utf8'))
-        writer = csv.writer(response)
-        for item in list(ingredients):
-            writer.writerow(item)
+            'total_amount'
+        ).order_by('ingredient__name')
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients.iterator(
+                chunk_size=settings.SHOPPING_LIST_CHUNK_SIZE
+            )),
+            content_type=renderer.media_type
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename='
+            f'"{settings.SHOPPING_LIST_FILE_NAME}.{renderer.format}"'
+        )
         return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if getattr(response, 'exception', False) and all(
+            isinstance(renderer, ShoppingListRenderer)
+            for renderer in self.get_renderers()
+        ):
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -1,4 +1,7 @@
 import os
+from datetime import timedelta
+
+from django.core.exceptions import ImproperlyConfigured
 
 from dotenv import load_dotenv
 
@@ -23,9 +26,9 @@ INSTALLED_APPS = [
     'rest_framework',
     'django_filters',
     'djoser',
-    'recipes',
+    'recipes.apps.RecipesConfig',
     'users',
-    'api'
+    'api.apps.ApiConfig'
 
 ]
 
@@ -71,6 +74,33 @@ DATABASES = {
         'PORT': os.getenv('DB_PORT', default=5432)
     }
 }
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    },
+    'auth': {
+        'BACKEND': os.getenv(
+            'AUTH_CACHE_BACKEND',
+            default='django.core.cache.backends.db.DatabaseCache'
+        ),
+        'LOCATION': os.getenv('AUTH_CACHE_LOCATION', default='auth_cache'),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 10 ** 7},
+    },
+}
+
+REFERENCE_CACHE_ENABLED = True
+REFERENCE_CACHE_TIMEOUT = 60 * 60
+RECIPE_CACHE_ENABLED = True
+RECIPE_CACHE_TIMEOUT = 60 * 60
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+FEED_TIMELINE_MIN_FOLLOWING = 100
+FEED_TIMELINE_SIZE = 500
+
 AUTH_USER_MODEL = 'users.User'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -107,10 +137,28 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 }
 
+AUTH_STATELESS = os.getenv('AUTH_STATELESS', default='False') == 'True'
+AUTH_REVOCATION_CACHE_ALIAS = 'auth'
+AUTH_REVOCATION_LOCAL_TIMEOUT = 5
+if AUTH_STATELESS:
+    if 'locmem' in CACHES[AUTH_REVOCATION_CACHE_ALIAS]['BACKEND']:
+        raise ImproperlyConfigured(
+            'AUTH_STATELESS требует общего кеша для списка отозванных токенов'
+        )
+    REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'].insert(
+        0, 'api.authentication.StatelessTokenAuthentication'
+    )
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=5),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+    'AUTH_HEADER_TYPES': ('Token', 'Bearer'),
+}
+
 DJOSER = {
     'HIDE_USERS': False,
     'LOGIN_FIELD': 'email',
@@ -126,5 +174,50 @@ DJOSER = {
     }
 }
 
+INGREDIENT_SEARCH_IN_MEMORY = True
+INGREDIENT_INDEX_TTL = 60
+RECIPE_INDEX_MAX_CHANGES = 1000
+RECIPE_INDEX_TTL = 5 * 60
+RECIPE_INDEX_CHANGES_TIMEOUT = 24 * 60 * 60
+SIMILAR_RECIPES_LIMIT = 6
+SIMILAR_RECIPES_MAX_LIMIT = 30
+SIMILAR_RECIPES_TIMEOUT = 60 * 60
+SIMILAR_RECIPES_PRECOMPUTE = 1000
+SEARCH_CONFIG = 'russian'
+
+RECIPE_BATCH_MAX_SIZE = 50
+
+TOKEN_CACHE_ALIAS = 'default'
+TOKEN_CACHE_TIMEOUT = 5 * 60
+TOKEN_CACHE_LOCAL_TIMEOUT = 10
+TOKEN_CACHE_SIZE = 10000
+
+RECIPE_SCORE_WEIGHTS = {
+    'favorite': 1.0,
+    'shopping_cart': 0.5,
+}
+RECIPE_SCORE_HALF_LIFE = {
+    'popular': timedelta(days=7),
+    'trending': timedelta(hours=12),
+}
+RECIPE_SCORE_MIN = 0.001
+
+SHOPPING_LIST_FILE_NAME = 'Shoppinglist'
+SHOPPING_LIST_CHUNK_SIZE = 8192
+SHOPPING_LIST_PDF_MAX_ROWS = 2000
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+IMAGE_UPLOAD_MAX_MEMORY = 2 * 1024 * 1024
+IMAGE_VARIANTS = {
+    'card': 360,
+    'detail': 720,
+    'retina': 1440,
+}
+IMAGE_VARIANTS_QUALITY = 80
+IMAGE_VARIANTS_WORKERS = int(os.getenv('IMAGE_VARIANTS_WORKERS', default=2))
+
 MEDIA_URL = 'http://51.250.31.177/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -5,7 +5,9 @@ from .models import (
     Ingredient,
     IngredientRecipe,
     Recipe,
+    RecipeScore,
     ShoppingCart,
+    ShoppingListItem,
     Tag
 )
 
@@ -41,15 +43,31 @@ class TagAdmin(admin.ModelAdmin):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'name', 'author', 'favorite_count',)
+    list_display = (
+        'pk', 'name', 'author', 'favorites_count', 'in_carts_count',
+    )
     search_fields = ('author', 'name',)
     list_filter = ('author', 'name', 'tags',)
     inlines = [
         IngredientRecipeInline,
     ]
 
-    def favorite_count(self, obj):
-        return obj.favorit_recipe.count()
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        ShoppingListItem.objects.rebuild(
+            form.instance.shopping.values('user')
+        )
+
+
+@admin.register(RecipeScore)
+class RecipeScoreAdmin(admin.ModelAdmin):
+    list_display = (
+        'recipe',
+        'popular',
+        'trending',
+        'updated',
+    )
+    search_fields = ('recipe__name',)
 
 
 @admin.register(Favorite)
@@ -58,6 +76,7 @@ class FavoriteAdmin(admin.ModelAdmin):
         'pk',
         'user',
         'recipe',
+        'created',
     )
     list_filter = ('user', 'recipe',)
     search_fields = ('user', 'recipe',)
@@ -69,6 +88,33 @@ class ShoppingCartAdmin(admin.ModelAdmin):
         'pk',
         'user',
         'recipe',
+        'created',
     )
     list_filter = ('user', 'recipe',)
     search_fields = ('user', 'recipe',)
+
+    def save_model(self, request, obj, form, change):
+        users = {obj.user_id, form.initial.get('user')} - {None}
+        super().save_model(request, obj, form, change)
+        ShoppingListItem.objects.rebuild(users)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        ShoppingListItem.objects.rebuild([obj.user_id])
+
+    def delete_queryset(self, request, queryset):
+        users = set(queryset.values_list('user', flat=True))
+        super().delete_queryset(request, queryset)
+        ShoppingListItem.objects.rebuild(users)
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'user',
+        'ingredient',
+        'total_amount',
+    )
+    list_filter = ('user',)
+    search_fields = ('user__username', 'ingredient__name',)
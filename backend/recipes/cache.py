@@ -0,0 +1,93 @@
+import time
+from math import ceil
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from .models import Recipe
+
+
+PROCESS_LOCAL_CACHE_WARNING = (
+    'Кеш по умолчанию хранится в памяти процесса: запущенный сервер '
+    'увидит новые теги и ингредиенты только через REFERENCE_CACHE_TIMEOUT'
+)
+
+
+def is_process_local(alias=DEFAULT_CACHE_ALIAS):
+    return isinstance(caches[alias], (DummyCache, LocMemCache))
+
+
+def version_key(name):
+    return f'version:{name}'
+
+
+def current_second():
+    return ceil(time.time())
+
+
+def get_version(name):
+    version = cache.get(version_key(name))
+    if version is None:
+        cache.add(version_key(name), current_second(), None)
+        version = cache.get(version_key(name))
+    return version
+
+
+def bump_version(name):
+    previous = cache.get(version_key(name), 0)
+    cache.set(
+        version_key(name), max(current_second(), ceil(previous) + 1), None
+    )
+
+
+def get_versions(names):
+    keys = {version_key(name): name for name in names}
+    versions = cache.get_many(keys)
+    missing = {key: current_second() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def bump_version_on_commit(name):
+    transaction.on_commit(lambda: bump_version(name))
+
+
+def get_user_relations(user):
+    version = get_version(f'user-relations:{user.id}')
+    key = f'user-relations:{user.id}:{version}'
+    relations = cache.get(key)
+    if relations is None:
+        relations = (
+            frozenset(user.favorites.values_list('recipe', flat=True)),
+            frozenset(user.shopping.values_list('recipe', flat=True)),
+            frozenset(user.follower.values_list('following', flat=True)),
+        )
+        cache.set(key, relations, settings.RECIPE_CACHE_TIMEOUT)
+    return relations
+
+
+def invalidate_user_relations(user_id):
+    bump_version_on_commit(f'user-relations:{user_id}')
+
+
+def get_feed_timeline(user, following):
+    if len(following) < settings.FEED_TIMELINE_MIN_FOLLOWING:
+        return None
+    versions = get_versions({'recipes', f'user-relations:{user.id}'})
+    key = 'feed:{}:{}:{}'.format(
+        user.id, versions['recipes'], versions[f'user-relations:{user.id}']
+    )
+    timeline = cache.get(key)
+    if timeline is None:
+        timeline = list(Recipe.objects.feed_for(user).order_by(
+            '-pub_date', '-id'
+        ).values_list(
+            'pub_date', 'id', 'author'
+        )[:settings.FEED_TIMELINE_SIZE])
+        cache.set(key, timeline, settings.RECIPE_CACHE_TIMEOUT)
+    return timeline
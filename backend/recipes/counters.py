@@ -0,0 +1,110 @@
+import threading
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Favorite, Recipe, ShoppingCart
+from users.models import Follow, User
+
+COUNTERS = {
+    Favorite: ('recipe', 'favorites_count'),
+    ShoppingCart: ('recipe', 'in_carts_count'),
+    Follow: ('following', 'followers_count'),
+    Recipe: ('author', 'recipes_count'),
+}
+
+OWNERS = {
+    Favorite: 'user',
+    ShoppingCart: 'user',
+    Follow: 'user',
+}
+
+deletions = threading.local()
+
+
+def deleting():
+    if not hasattr(deletions, 'objects'):
+        deletions.objects = set()
+    return deletions.objects
+
+
+def counted_model(model):
+    relation, _ = COUNTERS[model]
+    return model._meta.get_field(relation).related_model
+
+
+def update_counter(model, target_ids, delta):
+    _, counter = COUNTERS[model]
+    if target_ids:
+        counted_model(model).objects.filter(pk__in=target_ids).update(
+            **{counter: F(counter) + delta}
+        )
+
+
+def count_by_owner(model, owner_id):
+    relation, _ = COUNTERS[model]
+    return model.objects.filter(
+        **{OWNERS[model]: owner_id}
+    ).order_by().values(relation)
+
+
+def release_owner(owner_id):
+    for model in OWNERS:
+        relation, counter = COUNTERS[model]
+        rows = count_by_owner(model, owner_id)
+        counted_model(model).objects.filter(pk__in=rows).update(**{
+            counter: F(counter) - Subquery(
+                rows.filter(**{relation: OuterRef('pk')}).annotate(
+                    total=Count('pk')
+                ).values('total')
+            )
+        })
+
+
+def begin_delete(instance):
+    deleting().add((type(instance), instance.pk))
+    if isinstance(instance, User):
+        release_owner(instance.pk)
+
+
+def end_delete(instance):
+    deleting().discard((type(instance), instance.pk))
+
+
+def counted_row_deleted(instance):
+    model = type(instance)
+    relation, _ = COUNTERS[model]
+    target_id = getattr(instance, f'{relation}_id')
+    if (counted_model(model), target_id) in deleting():
+        return
+    owner = OWNERS.get(model)
+    if owner and (User, getattr(instance, f'{owner}_id')) in deleting():
+        return
+    update_counter(model, [target_id], -1)
+
+
+def update_counter_for(instance, delta):
+    relation, _ = COUNTERS[type(instance)]
+    update_counter(
+        type(instance), [getattr(instance, f'{relation}_id')], delta
+    )
+
+
+def actual_count(model):
+    relation, _ = COUNTERS[model]
+    return Coalesce(Subquery(
+        model.objects.filter(**{relation: OuterRef('pk')}).order_by().values(
+            relation
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def reconcile_counter(model, dry_run=False):
+    _, counter = COUNTERS[model]
+    objects = counted_model(model).objects
+    stale = objects.annotate(actual=actual_count(model)).exclude(
+        **{counter: F('actual')}
+    ).count()
+    if stale and not dry_run:
+        objects.update(**{counter: actual_count(model)})
+    return stale
@@ -0,0 +1,94 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .cache import bump_version
+from .models import Recipe
+from .storage import recipe_image_storage
+
+IMAGE_FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+
+executor = None
+
+
+def variant_name(name, variant, extension):
+    return f'{os.path.splitext(name)[0]}_{variant}.{extension}'
+
+
+def variant_names(name):
+    return [
+        variant_name(name, variant, extension)
+        for variant in settings.IMAGE_VARIANTS
+        for extension in IMAGE_FORMATS
+    ]
+
+
+def render_variants(path, variants, quality):
+    with Image.open(path) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+    for variant, width in variants.items():
+        resized = image.copy()
+        resized.thumbnail((width, image.height), Image.LANCZOS)
+        for extension, image_format in IMAGE_FORMATS.items():
+            target = variant_name(path, variant, extension)
+            temporary = f'{target}.tmp'
+            resized.save(temporary, image_format, quality=quality)
+            os.replace(temporary, target)
+    return path
+
+
+def mark_variants_ready(name):
+    try:
+        recipe_ids = list(
+            Recipe.objects.filter(image=name).values_list('id', flat=True)
+        )
+        Recipe.objects.filter(id__in=recipe_ids).update(
+            has_image_variants=True
+        )
+        for recipe_id in recipe_ids:
+            bump_version(f'recipe:{recipe_id}')
+    finally:
+        connection.close()
+
+
+def get_executor():
+    global executor
+    if executor is None:
+        executor = ProcessPoolExecutor(settings.IMAGE_VARIANTS_WORKERS)
+    return executor
+
+
+def submit_variants(name):
+    arguments = (
+        recipe_image_storage.path(name),
+        settings.IMAGE_VARIANTS,
+        settings.IMAGE_VARIANTS_QUALITY,
+    )
+    if not settings.IMAGE_VARIANTS_WORKERS:
+        render_variants(*arguments)
+        Recipe.objects.filter(image=name).update(has_image_variants=True)
+        return
+    future = get_executor().submit(render_variants, *arguments)
+    future.add_done_callback(
+        lambda future: future.exception() is None and mark_variants_ready(
+            name
+        )
+    )
+
+
+def schedule_image_variants(recipe):
+    name = recipe.image.name
+    ready = all(
+        recipe_image_storage.exists(item) for item in variant_names(name)
+    )
+    if recipe.has_image_variants != ready:
+        Recipe.objects.filter(id=recipe.id).update(has_image_variants=ready)
+        recipe.has_image_variants = ready
+    if not ready:
+        transaction.on_commit(lambda: submit_variants(name))
@@ -0,0 +1,323 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import get_version, get_versions
+from .models import Ingredient, IngredientRecipe, Recipe
+
+RECIPE_CHANGES_SEQUENCE = 'recipe-index:sequence'
+EMPTY_POSTING = np.array([], dtype=np.int64)
+
+
+class IngredientNameIndex:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = None
+        self._items = None
+        self._version = None
+        self._built = None
+
+    def build(self):
+        version = get_version('ingredients')
+        items = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda item: (item['name'].lower(), item['id'])
+        )
+        with self._lock:
+            self._keys = [item['name'].lower() for item in items]
+            self._items = items
+            self._version = version
+            self._built = time.monotonic()
+        return self._keys, self._items
+
+    def invalidate(self):
+        with self._lock:
+            self._keys = None
+            self._items = None
+
+    def search(self, query):
+        with self._lock:
+            keys, items = self._keys, self._items
+            version, built = self._version, self._built
+        if (keys is None or version != get_version('ingredients')
+                or time.monotonic() - built > settings.INGREDIENT_INDEX_TTL):
+            keys, items = self.build()
+        query = query.strip().lower()
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + '\U0010ffff', start)
+        return items[start:end] + [
+            item for key, item in zip(keys, items)
+            if query in key and not key.startswith(query)
+        ]
+
+
+ingredient_name_index = IngredientNameIndex()
+
+
+def recipe_change_key(number):
+    return f'recipe-index:change:{number}'
+
+
+def reset_recipe_index():
+    cache.add(RECIPE_CHANGES_SEQUENCE, 0, None)
+    cache.incr(
+        RECIPE_CHANGES_SEQUENCE,
+        settings.RECIPE_INDEX_MAX_CHANGES + 1
+    )
+
+
+def log_recipe_changes(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    cache.add(RECIPE_CHANGES_SEQUENCE, 0, None)
+    last = cache.incr(RECIPE_CHANGES_SEQUENCE, len(recipe_ids))
+    if len(recipe_ids) > settings.RECIPE_INDEX_MAX_CHANGES:
+        return
+    first = last - len(recipe_ids) + 1
+    cache.set_many(
+        {
+            recipe_change_key(first + offset): recipe_id
+            for offset, recipe_id in enumerate(recipe_ids)
+        },
+        settings.RECIPE_INDEX_CHANGES_TIMEOUT
+    )
+
+
+class IngredientMatches:
+
+    def __init__(self, postings, ingredient_ids, recipe_ids, coverage):
+        self.postings = postings
+        self.ingredient_ids = ingredient_ids
+        self.recipe_ids = recipe_ids
+        self.coverage = coverage
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        return [
+            {
+                'id': int(recipe_id),
+                'coverage': float(coverage),
+                'missing': sorted(
+                    self.postings.features_of(int(recipe_id))
+                    - self.ingredient_ids
+                ),
+            }
+            for recipe_id, coverage in zip(
+                self.recipe_ids[key], self.coverage[key]
+            )
+        ]
+
+
+class Postings:
+
+    def __init__(self, pairs=()):
+        features = self.group(pairs)
+        postings = defaultdict(list)
+        self.sizes = np.zeros(max(features, default=0) + 1, dtype=np.int32)
+        for recipe_id, items in features.items():
+            self.sizes[recipe_id] = len(items)
+            for feature_id in items:
+                postings[feature_id].append(recipe_id)
+        self.postings = {
+            feature_id: np.array(sorted(recipe_ids), dtype=np.int64)
+            for feature_id, recipe_ids in postings.items()
+        }
+        self.features = {
+            recipe_id: frozenset(items)
+            for recipe_id, items in features.items()
+        }
+
+    @staticmethod
+    def group(pairs):
+        features = defaultdict(set)
+        for recipe_id, feature_id in pairs:
+            features[recipe_id].add(feature_id)
+        return features
+
+    def features_of(self, recipe_id):
+        return self.features.get(recipe_id, frozenset())
+
+    def sizes_of(self, recipe_ids):
+        sizes = np.zeros(len(recipe_ids), dtype=np.int32)
+        known = recipe_ids < len(self.sizes)
+        sizes[known] = self.sizes[recipe_ids[known]]
+        return sizes
+
+    def update(self, recipe_ids, pairs):
+        fresh = self.group(pairs)
+        for recipe_id in recipe_ids:
+            old = self.features.pop(recipe_id, frozenset())
+            new = frozenset(fresh.get(recipe_id, ()))
+            for feature_id in old - new:
+                posting = self.postings[feature_id]
+                self.postings[feature_id] = posting[posting != recipe_id]
+            for feature_id in new - old:
+                posting = self.postings.get(feature_id, EMPTY_POSTING)
+                self.postings[feature_id] = np.insert(
+                    posting, np.searchsorted(posting, recipe_id), recipe_id
+                )
+            if new:
+                self.features[recipe_id] = new
+            if recipe_id >= len(self.sizes):
+                self.sizes = np.concatenate((self.sizes, np.zeros(
+                    recipe_id + 1 - len(self.sizes), dtype=np.int32
+                )))
+            self.sizes[recipe_id] = len(new)
+
+    def match(self, feature_ids):
+        postings = [
+            self.postings[feature_id] for feature_id in feature_ids
+            if feature_id in self.postings
+        ]
+        return np.unique(
+            np.concatenate(postings or [EMPTY_POSTING]), return_counts=True
+        )
+
+
+class RecipeFeatureIndex:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ingredients = None
+        self.tags = None
+        self._sequence = None
+        self._built = None
+
+    def pairs(self, model, field, recipe_ids=None):
+        rows = model.objects.order_by()
+        if recipe_ids is not None:
+            rows = rows.filter(recipe__in=recipe_ids)
+        return rows.values_list('recipe', field).iterator()
+
+    def build(self):
+        sequence = cache.get(RECIPE_CHANGES_SEQUENCE, 0)
+        self.ingredients = Postings(self.pairs(IngredientRecipe, 'ingredient'))
+        self.tags = Postings(self.pairs(Recipe.tags.through, 'tag'))
+        self._sequence = sequence
+        self._built = time.monotonic()
+
+    def update(self, recipe_ids):
+        self.ingredients.update(
+            recipe_ids, self.pairs(IngredientRecipe, 'ingredient', recipe_ids)
+        )
+        self.tags.update(
+            recipe_ids, self.pairs(Recipe.tags.through, 'tag', recipe_ids)
+        )
+
+    def refresh(self):
+        sequence = cache.get(RECIPE_CHANGES_SEQUENCE, 0)
+        if (self.ingredients is None or sequence < self._sequence
+                or sequence - self._sequence
+                > settings.RECIPE_INDEX_MAX_CHANGES
+                or time.monotonic() - self._built
+                > settings.RECIPE_INDEX_TTL):
+            self.build()
+            return
+        if sequence == self._sequence:
+            return
+        keys = [
+            recipe_change_key(number)
+            for number in range(self._sequence + 1, sequence + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            self.build()
+            return
+        self.update(set(changes.values()))
+        self._sequence = sequence
+
+    def search(self, ingredient_ids):
+        query = frozenset(ingredient_ids)
+        with self._lock:
+            self.refresh()
+            ingredients = self.ingredients
+            recipe_ids, covered = ingredients.match(query)
+            coverage = covered / ingredients.sizes_of(recipe_ids)
+        order = np.lexsort((-recipe_ids, -covered, -coverage))
+        return IngredientMatches(
+            ingredients, query, recipe_ids[order], coverage[order]
+        )
+
+    def score_similar(self, recipe_id, limit):
+        ingredients = self.ingredients.features_of(recipe_id)
+        tags = self.tags.features_of(recipe_id)
+        by_ingredients, ingredients_shared = self.ingredients.match(
+            ingredients
+        )
+        by_tags, tags_shared = self.tags.match(tags)
+        recipe_ids = np.union1d(by_ingredients, by_tags)
+        shared = np.zeros(len(recipe_ids), dtype=np.int64)
+        shared[np.searchsorted(recipe_ids, by_ingredients)] += (
+            ingredients_shared
+        )
+        shared[np.searchsorted(recipe_ids, by_tags)] += tags_shared
+        similarity = shared / (
+            len(ingredients) + len(tags) - shared
+            + self.ingredients.sizes_of(recipe_ids)
+            + self.tags.sizes_of(recipe_ids)
+        )
+        others = recipe_ids != recipe_id
+        recipe_ids, similarity = recipe_ids[others], similarity[others]
+        if len(recipe_ids) > limit:
+            top = np.argpartition(-similarity, limit)[:limit]
+            recipe_ids, similarity = recipe_ids[top], similarity[top]
+        order = np.lexsort((-recipe_ids, -similarity))
+        return [
+            (int(pk), float(score))
+            for pk, score in zip(recipe_ids[order], similarity[order])
+        ]
+
+    def similar(self, recipe_ids, limit):
+        with self._lock:
+            self.refresh()
+            return {
+                recipe_id: self.score_similar(recipe_id, limit)
+                for recipe_id in recipe_ids
+            }
+
+
+recipe_feature_index = RecipeFeatureIndex()
+
+
+def similar_recipes_key(recipe_id, version):
+    return f'similar:{recipe_id}:{version}'
+
+
+def get_similar_recipes(recipe_id):
+    key = similar_recipes_key(recipe_id, get_version(f'recipe:{recipe_id}'))
+    neighbours = cache.get(key)
+    if neighbours is None:
+        neighbours = recipe_feature_index.similar(
+            [recipe_id], settings.SIMILAR_RECIPES_MAX_LIMIT
+        )[recipe_id]
+        cache.set(key, neighbours, settings.SIMILAR_RECIPES_TIMEOUT)
+    return neighbours
+
+
+def precompute_similar_recipes(recipe_ids):
+    neighbours = recipe_feature_index.similar(
+        recipe_ids, settings.SIMILAR_RECIPES_MAX_LIMIT
+    )
+    versions = get_versions(
+        {f'recipe:{recipe_id}' for recipe_id in neighbours}
+    )
+    cache.set_many(
+        {
+            similar_recipes_key(recipe_id, versions[f'recipe:{recipe_id}']):
+                items
+            for recipe_id, items in neighbours.items()
+        },
+        settings.SIMILAR_RECIPES_TIMEOUT
+    )
+    return len(neighbours)
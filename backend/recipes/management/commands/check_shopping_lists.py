@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = 'Сверяет списки покупок пользователей с их корзинами'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='id пользователя; по умолчанию проверяются все списки'
+        )
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Пересобрать списки пользователей с расхождениями'
+        )
+
+    def handle(self, *args, **options):
+        inconsistencies = ShoppingListItem.objects.inconsistencies(
+            options['users']
+        )
+        if not inconsistencies:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+        for user, ingredient, expected, actual in inconsistencies:
+            self.stdout.write(
+                f'Пользователь {user}, ингредиент {ingredient}: '
+                f'ожидается {expected}, в списке {actual}'
+            )
+        users = {user for user, *_ in inconsistencies}
+        if options['fix']:
+            ShoppingListItem.objects.rebuild(users)
+            self.stdout.write(self.style.SUCCESS(
+                f'Пересобраны списки пользователей: {len(users)}'
+            ))
+            return
+        raise CommandError(f'Найдено расхождений: {len(inconsistencies)}')
@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from recipes.images import variant_names
+from recipes.models import Recipe
+from recipes.storage import recipe_image_storage
+
+
+class Command(BaseCommand):
+    help = 'Удаляет изображения, на которые не ссылается ни один рецепт'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=60 * 60,
+            help='Не трогать файлы моложе указанного числа секунд'
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        references = dict(
+            Recipe.objects.values('image').annotate(
+                references=Count('id')
+            ).values_list('image', 'references').order_by()
+        )
+        kept = set(references)
+        for name in references:
+            kept.update(variant_names(name))
+        upload_to = Recipe._meta.get_field('image').upload_to
+        threshold = timezone.now() - timedelta(seconds=options['min_age'])
+        removed = freed = 0
+        for name in recipe_image_storage.walk(upload_to.rstrip('/')):
+            if name in kept:
+                continue
+            if recipe_image_storage.get_modified_time(name) > threshold:
+                continue
+            freed += recipe_image_storage.size(name)
+            removed += 1
+            if not options['dry_run']:
+                recipe_image_storage.delete(name)
+        self.stdout.write(
+            f'Изображений в рецептах: {len(references)}, '
+            f'общих для нескольких рецептов: '
+            f'{sum(count > 1 for count in references.values())}'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено файлов: {removed}, освобождено байт: {freed}'
+        ))
@@ -0,0 +1,36 @@
+import json
+import sys
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand
+
+from recipes.transfer import export_batches
+
+
+class Command(BaseCommand):
+    help = 'Выгружает рецепты в файл JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Путь к файлу или - для стандартного вывода'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Количество рецептов, читаемых за один запрос'
+        )
+
+    def handle(self, *args, **options):
+        exported = 0
+        with ExitStack() as stack:
+            file = sys.stdout
+            if options['path'] != '-':
+                file = stack.enter_context(
+                    open(options['path'], 'w', encoding='utf-8')
+                )
+            for records in export_batches(options['batch_size']):
+                file.writelines(
+                    json.dumps(record, ensure_ascii=False) + '\n'
+                    for record in records
+                )
+                exported += len(records)
+        self.stderr.write(f'Выгружено рецептов: {exported}')
@@ -0,0 +1,177 @@
+import random
+import time
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from PIL import Image
+
+from recipes.cache import bump_version_on_commit
+from recipes.counters import COUNTERS, reconcile_counter
+from recipes.indexes import reset_recipe_index
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag
+)
+from recipes.scores import refresh_scores
+from recipes.storage import recipe_image_storage
+from users.models import Follow, User
+
+FIXTURE_PASSWORD = 'fixture-password'
+FIXTURE_TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+
+
+class Command(BaseCommand):
+    help = ('Создает синтетических пользователей, подписки, рецепты, '
+            'избранное и корзины на основе каталога ингредиентов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--follows-per-user', type=int, default=20)
+        parser.add_argument('--favorites-per-user', type=int, default=30)
+        parser.add_argument('--carts-per-user', type=int, default=5)
+        parser.add_argument('--max-ingredients', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int)
+
+    def create_image(self):
+        image = BytesIO()
+        Image.new('RGB', (720, 480), '#C8A165').save(image, 'PNG')
+        return recipe_image_storage.save(
+            Recipe._meta.get_field('image').generate_filename(
+                None, 'fixture.png'
+            ),
+            ContentFile(image.getvalue())
+        )
+
+    def create_users(self, count):
+        start = User.objects.filter(username__startswith='fixture-').count()
+        password = make_password(FIXTURE_PASSWORD)
+        User.objects.bulk_create([
+            User(
+                username=f'fixture-{number}',
+                email=f'fixture-{number}@foodgram.local',
+                first_name='Тестовый',
+                last_name=f'Пользователь {number}',
+                password=password
+            )
+            for number in range(start, start + count)
+        ])
+        return list(User.objects.filter(
+            username__startswith='fixture-'
+        ).values_list('id', flat=True))
+
+    def create_recipes(self, count, authors, batch_size, max_ingredients):
+        tags = list(Tag.objects.values_list('id', flat=True))
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        image = self.create_image()
+        start = Recipe.objects.filter(name__startswith='fixture ').count()
+        recipe_ids = []
+        for offset in range(start, start + count, batch_size):
+            names = [
+                f'fixture {number}' for number in range(
+                    offset, min(offset + batch_size, start + count)
+                )
+            ]
+            Recipe.objects.bulk_create([
+                Recipe(
+                    name=name, text=f'Описание рецепта {name}',
+                    author_id=self.random.choice(authors), image=image,
+                    cooking_time=self.random.randint(5, 120)
+                )
+                for name in names
+            ])
+            batch = list(Recipe.objects.filter(
+                name__in=names
+            ).values_list('id', flat=True))
+            IngredientRecipe.objects.bulk_create([
+                IngredientRecipe(
+                    recipe_id=recipe_id, ingredient_id=ingredient_id,
+                    amount=self.random.randint(1, 500)
+                )
+                for recipe_id in batch
+                for ingredient_id in self.random.sample(
+                    ingredients,
+                    self.random.randint(2, max_ingredients)
+                )
+            ])
+            Recipe.tags.through.objects.bulk_create([
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in batch
+                for tag_id in self.random.sample(
+                    tags, self.random.randint(1, len(tags))
+                )
+            ])
+            recipe_ids.extend(batch)
+        return recipe_ids
+
+    def create_links(self, model, field, users, targets, per_user,
+                     batch_size):
+        per_user = min(per_user, len(targets))
+        step = max(1, batch_size // max(per_user, 1))
+        for start in range(0, len(users), step):
+            model.objects.bulk_create(
+                [
+                    model(user_id=user_id, **{f'{field}_id': target_id})
+                    for user_id in users[start:start + step]
+                    for target_id in self.random.sample(targets, per_user)
+                    if target_id != user_id or model is not Follow
+                ],
+                ignore_conflicts=True
+            )
+
+    def finish(self, users, recipe_ids):
+        for model in COUNTERS:
+            reconcile_counter(model)
+        refresh_scores(full=True)
+        Recipe.objects.filter(id__in=recipe_ids).update_search_vector()
+        ShoppingListItem.objects.rebuild(users)
+        transaction.on_commit(reset_recipe_index)
+        bump_version_on_commit('recipes')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        started = time.monotonic()
+        call_command('load_data', stdout=self.stdout)
+        with transaction.atomic():
+            for name, color, slug in FIXTURE_TAGS:
+                Tag.objects.get_or_create(
+                    slug=slug, defaults={'name': name, 'color': color}
+                )
+            users = self.create_users(options['users'])
+            recipe_ids = self.create_recipes(
+                options['recipes'], users, options['batch_size'],
+                options['max_ingredients']
+            )
+            all_recipes = list(Recipe.objects.values_list('id', flat=True))
+            self.create_links(
+                Follow, 'following', users, users,
+                options['follows_per_user'], options['batch_size']
+            )
+            self.create_links(
+                Favorite, 'recipe', users, all_recipes,
+                options['favorites_per_user'], options['batch_size']
+            )
+            self.create_links(
+                ShoppingCart, 'recipe', users, all_recipes,
+                options['carts_per_user'], options['batch_size']
+            )
+            self.finish(users, recipe_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(users)}, новых рецептов: '
+            f'{len(recipe_ids)}, пароль: {FIXTURE_PASSWORD}, '
+            f'{time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from recipes import images
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создает уменьшенные копии изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Проверить все рецепты, а не только без копий'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.only('id', 'image', 'has_image_variants')
+        if not options['all']:
+            recipes = recipes.filter(has_image_variants=False)
+        for recipe in recipes.iterator():
+            images.schedule_image_variants(recipe)
+        if images.executor is not None:
+            images.executor.shutdown(wait=True)
+        self.stdout.write(self.style.SUCCESS('Копии изображений созданы'))
@@ -0,0 +1,102 @@
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.cache import (
+    PROCESS_LOCAL_CACHE_WARNING,
+    bump_version,
+    is_process_local
+)
+from recipes.indexes import ingredient_name_index
+from recipes.transfer import RecipeImporter, invalid_fields
+
+
+class Command(BaseCommand):
+    help = 'Загружает рецепты из файла JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Путь к файлу или - для стандартного ввода'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество рецептов в одной транзакции'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Процессов для разбора изображений, 0 - без пула'
+        )
+
+    def read_records(self, file):
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as error:
+                raise CommandError(
+                    f'Строка {number}: некорректный JSON: {error}'
+                )
+            if not isinstance(record, dict):
+                raise CommandError(f'Строка {number}: ожидается объект JSON')
+            invalid = invalid_fields(record)
+            if invalid:
+                raise CommandError(
+                    f'Строка {number}: отсутствуют или некорректны поля '
+                    f'{", ".join(invalid)}'
+                )
+            yield record
+
+    def read_batches(self, file, batch_size):
+        records = self.read_records(file)
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def invalidate(self, created):
+        for name in ('recipes', *created):
+            bump_version(name)
+        if 'ingredients' in created:
+            ingredient_name_index.invalidate()
+        if created and is_process_local():
+            self.stderr.write(PROCESS_LOCAL_CACHE_WARNING)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        with ExitStack() as stack:
+            file = sys.stdin
+            if options['path'] != '-':
+                try:
+                    file = stack.enter_context(
+                        open(options['path'], encoding='utf-8')
+                    )
+                except FileNotFoundError:
+                    raise CommandError(f'Файл {options["path"]} не найден.')
+            executor = None
+            if options['workers']:
+                executor = stack.enter_context(
+                    ProcessPoolExecutor(options['workers'])
+                )
+            importer = RecipeImporter(executor)
+            for records in self.read_batches(file, options['batch_size']):
+                importer.import_batch(records)
+        self.invalidate(importer.created)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено рецептов: {importer.imported}, '
+            f'{importer.imported / elapsed * 60:.0f} в минуту'
+        ))
+        for reason, count in importer.skipped.items():
+            self.stdout.write(f'Пропущено ({reason}): {count}')
+        if importer.imported:
+            self.stdout.write(
+                'Уменьшенные копии изображений создаст generate_image_variants'
+            )
@@ -1,31 +1,125 @@
+import csv
 import json
 import os
+import re
+import time
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
 from foodgram.settings import DATA_FILES_DIR
 
+from recipes.cache import (
+    PROCESS_LOCAL_CACHE_WARNING,
+    bump_version,
+    is_process_local
+)
+from recipes.indexes import ingredient_name_index
 from recipes.models import Ingredient
 
+READ_CHUNK_SIZE = 64 * 1024
+JSON_SEPARATORS = re.compile(r'[\s\[,]*')
+
+
+def read_json(file):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    for chunk in iter(lambda: file.read(READ_CHUNK_SIZE), ''):
+        buffer += chunk
+        position = 0
+        while True:
+            position = JSON_SEPARATORS.match(buffer, position).end()
+            if position == len(buffer) or buffer[position] == ']':
+                break
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield item['name'], item['measurement_unit']
+        buffer = buffer[position:]
+    if buffer.strip(' \t\r\n]'):
+        raise CommandError('Файл JSON обрезан или повреждён')
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if row:
+            yield row[0], row[1]
+
+
+READERS = {
+    'json': read_json,
+    'csv': read_csv,
+}
+
 
 class Command(BaseCommand):
+    help = 'Загружает ингредиенты из файла JSON или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=os.path.join(DATA_FILES_DIR, 'ingredients.json'),
+            help='Путь к файлу с ингредиентами'
+        )
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файла, по умолчанию определяется по расширению'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Количество строк в одной вставке'
+        )
 
     def handle(self, *args, **options):
-        file_name = 'ingredients.json'
-        json_path = os.path.join(DATA_FILES_DIR, file_name)
+        path = options['path']
+        file_format = (
+            options['format'] or os.path.splitext(path)[1].lstrip('.')
+        )
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла {path}')
+        before = Ingredient.objects.count()
+        started = time.monotonic()
+        rows = 0
         try:
-            with open(json_path, 'rb') as file:
-                data = json.load(file)
-                ingredients = [
-                    Ingredient(
-                        name=item.get('name'),
-                        measurement_unit=item.get('measurement_unit'),
-                    )
-                    for item in data
-                ]
-                Ingredient.objects.bulk_create(ingredients)
-            print('finished')
+            with open(path, encoding='utf-8', newline='') as file:
+                items = READERS[file_format](file)
+                while True:
+                    batch = [
+                        Ingredient(
+                            name=name.strip(),
+                            measurement_unit=measurement_unit.strip()
+                        )
+                        for name, measurement_unit in islice(
+                            items, options['batch_size']
+                        )
+                    ]
+                    if not batch:
+                        break
+                    with transaction.atomic():
+                        Ingredient.objects.bulk_create(
+                            batch, ignore_conflicts=True
+                        )
+                    rows += len(batch)
         except FileNotFoundError:
-
-            print(f'Файл {file_name} не найден.')
-            return
+            raise CommandError(f'Файл {path} не найден.')
+        except (KeyError, IndexError):
+            raise CommandError(
+                'У каждой записи должны быть название и единица измерения'
+            )
+        bump_version('ingredients')
+        ingredient_name_index.invalidate()
+        if is_process_local():
+            self.stderr.write(PROCESS_LOCAL_CACHE_WARNING)
+        elapsed = time.monotonic() - started
+        created = Ingredient.objects.count() - before
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано строк: {rows}, добавлено: {created}, '
+            f'пропущено дубликатов: {rows - created}, '
+            f'{rows / elapsed if elapsed else rows:.0f} строк/с'
+        ))
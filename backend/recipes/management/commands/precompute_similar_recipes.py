@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.cache import is_process_local
+from recipes.indexes import precompute_similar_recipes
+from recipes.models import RecipeScore
+
+
+class Command(BaseCommand):
+    help = 'Заранее считает похожие рецепты для самых популярных рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=settings.SIMILAR_RECIPES_PRECOMPUTE,
+            help='Сколько популярных рецептов обработать'
+        )
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        if is_process_local():
+            raise CommandError(
+                'Кеш по умолчанию хранится в памяти процесса, сервер не '
+                'увидит посчитанные рецепты. Укажите CACHE_BACKEND с '
+                'общим кешем (memcached, redis)'
+            )
+        recipe_ids = list(RecipeScore.objects.order_by(
+            '-popular', '-trending'
+        ).values_list('recipe', flat=True)[:options['count']])
+        batch_size = options['batch_size']
+        total = 0
+        for start in range(0, len(recipe_ids), batch_size):
+            total += precompute_similar_recipes(
+                recipe_ids[start:start + batch_size]
+            )
+        self.stdout.write(f'Похожие рецепты посчитаны для {total} рецептов')
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает списки покупок пользователей из корзин'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='id пользователя; по умолчанию пересобираются все списки'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        ShoppingListItem.objects.rebuild(
+            options['users'], batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS('Списки покупок пересобраны'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import COUNTERS, counted_model, reconcile_counter
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики избранного, покупок, рецептов и подписчиков'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения'
+        )
+
+    def handle(self, *args, **options):
+        for model, (_, counter) in COUNTERS.items():
+            stale = reconcile_counter(model, dry_run=options['dry_run'])
+            self.stdout.write(
+                f'{counted_model(model).__name__}.{counter}: '
+                f'расхождений {stale}'
+            )
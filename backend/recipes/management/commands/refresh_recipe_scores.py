@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from recipes.scores import refresh_scores
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинги популярности и трендов рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать рейтинги с нуля по всей истории'
+        )
+
+    def handle(self, *args, **options):
+        decayed, updated = refresh_scores(full=options['full'])
+        self.stdout.write(
+            f'Затухание применено к {decayed} рейтингам, '
+            f'новые события у {updated} рецептов'
+        )
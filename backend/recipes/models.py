@@ -1,15 +1,30 @@
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    SearchVectorField
+)
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models.functions import RowNumber
 
-from users.models import User
+from .storage import recipe_image_storage
+from users.models import CounterFieldsMixin, User
 
 
 class Ingredient(models.Model):
-    name = models.CharField('Ингредиент', max_length=200)
+    name = models.CharField('Ингредиент', max_length=200, db_index=True)
     measurement_unit = models.CharField('Единица измерения', max_length=16)
 
     class Meta:
         ordering = ('id',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient'
+            ),
+        )
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
 
@@ -41,7 +56,109 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class StringAgg(models.Aggregate):
+    function = 'STRING_AGG'
+    output_field = models.TextField()
+
+
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(Favorite.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+            is_in_shopping_cart=models.Exists(ShoppingCart.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+        )
+
+    def with_related(self, user):
+        return self.prefetch_related(
+            'tags',
+            models.Prefetch(
+                'author',
+                queryset=User.objects.with_is_subscribed(user)
+            ),
+            models.Prefetch(
+                'ingredients_recipe',
+                queryset=IngredientRecipe.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        ).with_user_flags(user)
+
+    def search(self, value):
+        if connections[self.db].vendor == 'postgresql':
+            query = SearchQuery(value, config=settings.SEARCH_CONFIG)
+            return self.filter(search_vector=query).annotate(
+                rank=SearchRank(models.F('search_vector'), query)
+            ).order_by('-rank', '-pub_date', '-id')
+        return self.filter(
+            models.Q(name__icontains=value)
+            | models.Q(text__icontains=value)
+            | models.Q(id__in=IngredientRecipe.objects.filter(
+                ingredient__name__icontains=value
+            ).values('recipe'))
+        ).annotate(rank=models.Case(
+            models.When(name__icontains=value, then=models.Value(1)),
+            default=models.Value(0),
+            output_field=models.IntegerField()
+        )).order_by('-rank', '-pub_date', '-id')
+
+    def update_search_vector(self):
+        if connections[self.db].vendor != 'postgresql':
+            return 0
+        config = settings.SEARCH_CONFIG
+        ingredient_names = IngredientRecipe.objects.filter(
+            recipe=models.OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', models.Value(' '))
+        ).values('names')
+        return self.update(search_vector=(
+            SearchVector('name', weight='A', config=config)
+            + SearchVector(
+                models.Subquery(
+                    ingredient_names, output_field=models.TextField()
+                ),
+                weight='B',
+                config=config
+            )
+            + SearchVector('text', weight='C', config=config)
+        ))
+
+    def feed_for(self, user):
+        return self.filter(author__in=user.follower.values('following'))
+
+    def latest_for_authors(self, authors, limit=None):
+        queryset = self.filter(author__in=authors).only(
+            'id', 'name', 'image', 'has_image_variants', 'cooking_time',
+            'author'
+        )
+        if limit is None or not authors:
+            return queryset
+        sql, params = queryset.annotate(row_number=models.Window(
+            expression=RowNumber(),
+            partition_by=[models.F('author_id')],
+            order_by=[models.F('pub_date').desc(), models.F('id').desc()]
+        )).query.sql_with_params()
+        return self.model.objects.raw(
+            f'SELECT * FROM ({sql}) AS ranked '
+            'WHERE ranked.row_number <= %s',
+            (*params, limit)
+        )
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     name = models.CharField('Рецепт', max_length=200)
     text = models.TextField('Описание', blank=True, null=True)
     author = models.ForeignKey(
@@ -53,6 +170,11 @@ class Recipe(models.Model):
     image = models.ImageField(
         'Изображение',
         upload_to='recipes/images/',
+        storage=recipe_image_storage
+    )
+    has_image_variants = models.BooleanField(
+        'Уменьшенные копии изображения готовы',
+        default=False
     )
     cooking_time = models.PositiveIntegerField(
         verbose_name='Время приготовления',
@@ -75,11 +197,32 @@ class Recipe(models.Model):
         verbose_name='дата публикации',
         db_index=True
     )
+    favorites_count = models.IntegerField(
+        'В избранном', default=0, editable=False
+    )
+    in_carts_count = models.IntegerField(
+        'В списках покупок', default=0, editable=False
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
+
+    counter_fields = ('favorites_count', 'in_carts_count')
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = (
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -131,6 +274,9 @@ class Favorite(models.Model):
         related_name='favorites',
         verbose_name='Пользователь'
     )
+    created = models.DateTimeField(
+        'Добавлено', auto_now_add=True, db_index=True
+    )
 
     class Meta:
         verbose_name = 'Избранный'
@@ -160,6 +306,9 @@ class ShoppingCart(models.Model):
         related_name='shopping',
         verbose_name='Пользователь'
     )
+    created = models.DateTimeField(
+        'Добавлено', auto_now_add=True, db_index=True
+    )
 
     class Meta:
         verbose_name = 'Список покупок'
@@ -174,3 +323,185 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.recipe} в списке покупок у {self.user}'
+
+
+class RecipeScore(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+        verbose_name='Рецепт'
+    )
+    popular = models.FloatField('Популярность', default=0)
+    trending = models.FloatField('Тренд', default=0)
+    updated = models.DateTimeField('Пересчитано', blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = (
+            models.Index(fields=['-popular'], name='recipe_score_popular_idx'),
+            models.Index(
+                fields=['-trending'], name='recipe_score_trending_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe}: {self.popular:.2f} / {self.trending:.2f}'
+
+
+SHOPPING_LIST_UPSERT_BATCH_SIZE = 500
+
+
+class ShoppingListItemQuerySet(models.QuerySet):
+
+    def expected(self, users=None):
+        if users is None:
+            ingredients = IngredientRecipe.objects.filter(
+                recipe__shopping__user__isnull=False
+            )
+        else:
+            ingredients = IngredientRecipe.objects.filter(
+                recipe__shopping__user__in=users
+            )
+        return ingredients.values(
+            'recipe__shopping__user', 'ingredient'
+        ).annotate(total=models.Sum('amount')).values_list(
+            'recipe__shopping__user', 'ingredient', 'total'
+        ).order_by()
+
+    def apply_deltas(self, users, deltas):
+        deltas = {
+            ingredient: delta
+            for ingredient, delta in deltas.items() if delta
+        }
+        if not users or not deltas:
+            return
+        rows = sorted(
+            (user, ingredient, delta)
+            for user in users for ingredient, delta in deltas.items()
+        )
+        with transaction.atomic(using=self.db):
+            for start in range(0, len(rows), SHOPPING_LIST_UPSERT_BATCH_SIZE):
+                self.upsert_totals(
+                    rows[start:start + SHOPPING_LIST_UPSERT_BATCH_SIZE]
+                )
+            self.filter(user__in=users, total_amount__lte=0).delete()
+
+    def upsert_totals(self, rows):
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        meta = self.model._meta
+        table = quote(meta.db_table)
+        user, ingredient, total = (
+            quote(meta.get_field(name).column)
+            for name in ('user', 'ingredient', 'total_amount')
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ({user}, {ingredient}, {total}) '
+                f'VALUES {", ".join(["(%s, %s, %s)"] * len(rows))} '
+                f'ON CONFLICT ({user}, {ingredient}) DO UPDATE '
+                f'SET {total} = {table}.{total} + EXCLUDED.{total}',
+                [value for row in rows for value in row]
+            )
+
+    def add_recipes(self, user, recipes, sign=1):
+        amounts = IngredientRecipe.objects.filter(
+            recipe__in=recipes
+        ).values('ingredient').annotate(
+            total=models.Sum('amount')
+        ).values_list('ingredient', 'total').order_by()
+        self.apply_deltas(
+            [user.id], {
+                ingredient: sign * total for ingredient, total in amounts
+            }
+        )
+
+    def remove_recipes(self, user, recipes):
+        self.add_recipes(user, recipes, sign=-1)
+
+    def change_recipe(self, recipe, old_amounts, new_amounts):
+        self.apply_deltas(
+            list(recipe.shopping.values_list('user', flat=True)), {
+                ingredient: (
+                    new_amounts.get(ingredient, 0)
+                    - old_amounts.get(ingredient, 0)
+                )
+                for ingredient in {*old_amounts, *new_amounts}
+            }
+        )
+
+    def rebuild(self, users=None, batch_size=1000):
+        with transaction.atomic():
+            items = self.all()
+            if users is not None:
+                items = items.filter(user__in=users)
+            items.delete()
+            batch = []
+            for user, ingredient, total in self.expected(users).iterator(
+                chunk_size=batch_size
+            ):
+                batch.append(ShoppingListItem(
+                    user_id=user, ingredient_id=ingredient, total_amount=total
+                ))
+                if len(batch) >= batch_size:
+                    self.bulk_create(batch)
+                    batch = []
+            self.bulk_create(batch)
+
+    def inconsistencies(self, users=None):
+        expected = {
+            (user, ingredient): total
+            for user, ingredient, total in self.expected(users).iterator()
+        }
+        items = self.all()
+        if users is not None:
+            items = items.filter(user__in=users)
+        actual = {
+            (user, ingredient): total
+            for user, ingredient, total in items.values_list(
+                'user', 'ingredient', 'total_amount'
+            ).iterator()
+        }
+        return [
+            (user, ingredient, expected.get((user, ingredient), 0),
+             actual.get((user, ingredient), 0))
+            for user, ingredient in sorted({*expected, *actual})
+            if expected.get((user, ingredient)) != actual.get(
+                (user, ingredient)
+            )
+        ]
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.IntegerField('Количество', default=0)
+
+    objects = ShoppingListItemQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Продукт в списке покупок'
+        verbose_name_plural = 'Продукты в списках покупок'
+        ordering = ('user',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.ingredient} в списке покупок у {self.user}'
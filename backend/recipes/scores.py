@@ -0,0 +1,77 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from .models import Favorite, Recipe, RecipeScore, ShoppingCart
+
+SCORE_EVENTS = {
+    'favorite': Favorite,
+    'shopping_cart': ShoppingCart,
+}
+SCORE_FIELDS = ('popular', 'trending')
+
+
+def decay(age, field):
+    return 0.5 ** (age / settings.RECIPE_SCORE_HALF_LIFE[field])
+
+
+def event_scores(since, now):
+    scores = defaultdict(lambda: dict.fromkeys(SCORE_FIELDS, 0.0))
+    for kind, model in SCORE_EVENTS.items():
+        weight = settings.RECIPE_SCORE_WEIGHTS[kind]
+        events = model.objects.filter(created__lte=now)
+        if since is not None:
+            events = events.filter(created__gt=since)
+        for recipe_id, created in events.values_list(
+            'recipe', 'created'
+        ).order_by().iterator():
+            for field in SCORE_FIELDS:
+                scores[recipe_id][field] += weight * decay(
+                    now - created, field
+                )
+    return scores
+
+
+def decay_scores(since, now):
+    if since is None:
+        return 0
+    decayed = RecipeScore.objects.filter(
+        Q(popular__gt=0) | Q(trending__gt=0)
+    ).update(updated=now, **{
+        field: F(field) * decay(now - since, field) for field in SCORE_FIELDS
+    })
+    for field in SCORE_FIELDS:
+        RecipeScore.objects.filter(**{
+            f'{field}__gt': 0, f'{field}__lt': settings.RECIPE_SCORE_MIN
+        }).update(**{field: 0})
+    return decayed
+
+
+@transaction.atomic
+def refresh_scores(full=False, now=None):
+    now = now or timezone.now()
+    if full:
+        RecipeScore.objects.update(popular=0, trending=0, updated=None)
+    RecipeScore.objects.bulk_create(
+        RecipeScore(recipe_id=recipe_id)
+        for recipe_id in Recipe.objects.filter(
+            score__isnull=True
+        ).values_list('id', flat=True)
+    )
+    since = RecipeScore.objects.aggregate(since=Max('updated'))['since']
+    decayed = decay_scores(since, now)
+    fresh = event_scores(since, now)
+    scores = RecipeScore.objects.in_bulk(fresh)
+    for recipe_id, score in scores.items():
+        for field in SCORE_FIELDS:
+            setattr(
+                score, field, getattr(score, field) + fresh[recipe_id][field]
+            )
+        score.updated = now
+    RecipeScore.objects.bulk_update(
+        scores.values(), [*SCORE_FIELDS, 'updated']
+    )
+    return decayed, len(scores)
@@ -0,0 +1,193 @@
+from django.db import connection, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_migrate
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from .cache import (
+    bump_version,
+    bump_version_on_commit,
+    invalidate_user_relations
+)
+from .counters import (
+    begin_delete,
+    counted_row_deleted,
+    end_delete,
+    update_counter_for
+)
+from .indexes import (
+    ingredient_name_index,
+    log_recipe_changes,
+    reset_recipe_index
+)
+from .models import (
+    Favorite,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    RecipeScore,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag
+)
+from users.models import Follow, User
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_lists(sender, instance, **kwargs):
+    ShoppingListItem.objects.change_recipe(
+        instance,
+        dict(instance.ingredients_recipe.values_list('ingredient', 'amount')),
+        {}
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    bump_version('ingredients')
+    ingredient_name_index.invalidate()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    bump_version('tags')
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe(sender, instance, created=True, **kwargs):
+    bump_version_on_commit(f'recipe:{instance.id}')
+    if created:
+        bump_version_on_commit('recipes')
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: Recipe.objects.filter(pk=instance.pk).update_search_vector()
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_search_vectors(sender, instance, created, **kwargs):
+    if not created:
+        transaction.on_commit(lambda: Recipe.objects.filter(
+            ingredients_recipe__ingredient=instance
+        ).update_search_vector())
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_score(sender, instance, created, **kwargs):
+    if created:
+        RecipeScore.objects.create(recipe=instance)
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def invalidate_recipe_ingredients(sender, instance, **kwargs):
+    bump_version_on_commit(f'recipe:{instance.recipe_id}')
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        bump_version_on_commit(f'recipe:{instance.id}')
+        return
+    if pk_set is None:
+        bump_version_on_commit('tags')
+        return
+    for recipe_id in pk_set:
+        bump_version_on_commit(f'recipe:{recipe_id}')
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Follow)
+def invalidate_relations(sender, instance, **kwargs):
+    invalidate_user_relations(instance.user_id)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Follow)
+@receiver(post_save, sender=Recipe)
+def increment_counter(sender, instance, created, **kwargs):
+    if created:
+        update_counter_for(instance, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Follow)
+@receiver(post_delete, sender=Recipe)
+def decrement_counter(sender, instance, **kwargs):
+    counted_row_deleted(instance)
+
+
+@receiver(pre_delete, sender=Recipe)
+@receiver(pre_delete, sender=User)
+def mark_counted_deleting(sender, instance, **kwargs):
+    begin_delete(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def unmark_counted_deleting(sender, instance, **kwargs):
+    end_delete(instance)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def log_recipe_features_change(sender, instance, **kwargs):
+    recipe_id = instance.id if sender is Recipe else instance.recipe_id
+    transaction.on_commit(lambda: log_recipe_changes([recipe_id]))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def log_recipe_tags_change(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse and pk_set is None:
+        transaction.on_commit(reset_recipe_index)
+        return
+    recipe_ids = list(pk_set) if reverse else [instance.id]
+    transaction.on_commit(lambda: log_recipe_changes(recipe_ids))
+
+
+@receiver(post_delete, sender=Tag)
+def reset_recipe_tags(sender, **kwargs):
+    transaction.on_commit(reset_recipe_index)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, instance, **kwargs):
+    bump_version_on_commit(f'user:{instance.id}')
+
+
+@receiver(post_migrate)
+def create_postgresql_indexes(sender, app_config, using, **kwargs):
+    if app_config.label != 'recipes' or connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        cursor.execute('DROP INDEX IF EXISTS recipes_ingredient_name_trgm')
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_upper_trgm '
+            f'ON {Ingredient._meta.db_table} '
+            'USING gin (UPPER(name::text) gin_trgm_ops)'
+        )
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_gin '
+            f'ON {Recipe._meta.db_table} USING gin (search_vector)'
+        )
+    Recipe.objects.filter(search_vector__isnull=True).update_search_vector()
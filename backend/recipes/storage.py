@@ -0,0 +1,41 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_digest_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        return os.path.join(
+            os.path.dirname(name),
+            digest[:2],
+            digest[2:4],
+            digest + os.path.splitext(name)[1].lower()
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_digest_name(name, content)
+        if self.exists(name):
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    def walk(self, path):
+        directories, files = self.listdir(path)
+        for file in files:
+            yield os.path.join(path, file)
+        for directory in directories:
+            yield from self.walk(os.path.join(path, directory))
+
+
+recipe_image_storage = ContentAddressedStorage()
@@ -0,0 +1,278 @@
+import base64
+import binascii
+import os
+from collections import Counter
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from PIL import Image
+
+from .counters import update_counter
+from .indexes import log_recipe_changes
+from .models import Ingredient, IngredientRecipe, Recipe, RecipeScore, Tag
+from .storage import recipe_image_storage
+from users.models import User
+
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+TAG_FIELDS = ('name', 'color', 'slug')
+INGREDIENT_FIELDS = ('name', 'measurement_unit', 'amount')
+RECORD_FIELDS = (
+    'name', 'text', 'cooking_time', 'pub_date', 'author', 'tags',
+    'ingredients', 'image'
+)
+IMAGE_TYPES = {'jpg': 'jpeg'}
+
+
+def encode_image(name):
+    extension = os.path.splitext(name)[1].lstrip('.').lower()
+    with recipe_image_storage.open(name) as file:
+        encoded = base64.b64encode(file.read()).decode()
+    return (
+        f'data:image/{IMAGE_TYPES.get(extension, extension)};base64,'
+        f'{encoded}'
+    )
+
+
+def recipe_record(recipe):
+    return {
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'pub_date': recipe.pub_date.isoformat(),
+        'author': {
+            field: getattr(recipe.author, field) for field in AUTHOR_FIELDS
+        },
+        'tags': [
+            {field: getattr(tag, field) for field in TAG_FIELDS}
+            for tag in recipe.tags.all()
+        ],
+        'ingredients': [
+            {
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.ingredients_recipe.all()
+        ],
+        'image': encode_image(recipe.image.name),
+    }
+
+
+def export_batches(batch_size):
+    recipes = Recipe.objects.select_related('author').prefetch_related(
+        'tags', 'ingredients_recipe__ingredient'
+    ).order_by('id')
+    last_id = 0
+    while True:
+        batch = list(recipes.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return
+        last_id = batch[-1].id
+        yield [recipe_record(recipe) for recipe in batch]
+
+
+def missing_fields(item, fields, prefix=''):
+    if not isinstance(item, dict):
+        return [prefix.rstrip('.')]
+    return [prefix + field for field in fields if field not in item]
+
+
+def invalid_fields(record):
+    invalid = missing_fields(record, RECORD_FIELDS)
+    if invalid:
+        return invalid
+    invalid += missing_fields(record['author'], AUTHOR_FIELDS, 'author.')
+    for field, fields in (
+        ('tags', TAG_FIELDS), ('ingredients', INGREDIENT_FIELDS)
+    ):
+        if not isinstance(record[field], list):
+            invalid.append(field)
+            continue
+        for item in record[field]:
+            invalid += missing_fields(item, fields, f'{field}.')
+    try:
+        if parse_datetime(str(record['pub_date'])) is None:
+            invalid.append('pub_date')
+    except ValueError:
+        invalid.append('pub_date')
+    return list(dict.fromkeys(invalid))
+
+
+def lookup_key(item, fields):
+    key = tuple(item[field] for field in fields)
+    return key if len(key) > 1 else key[0]
+
+
+def store_image(data):
+    try:
+        header, encoded = data.split(';base64,')
+        content = base64.b64decode(encoded)
+        with Image.open(BytesIO(content)) as image:
+            image.verify()
+    except (AttributeError, binascii.Error, OSError, ValueError):
+        return None
+    name = Recipe._meta.get_field('image').generate_filename(
+        None, 'image.' + header.split('/')[-1]
+    )
+    return recipe_image_storage.save(name, ContentFile(content))
+
+
+class RecipeImporter:
+
+    def __init__(self, executor=None):
+        self.executor = executor
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, measurement_unit): ingredient_id
+            for ingredient_id, name, measurement_unit
+            in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        }
+        self.authors = dict(User.objects.values_list('email', 'id'))
+        self.imported = 0
+        self.skipped = Counter()
+        self.created = set()
+
+    def resolve(self, lookup, model, fields, objects, **defaults):
+        missing = {}
+        for item in objects:
+            key = lookup_key(item, fields)
+            if key not in lookup:
+                missing[key] = item
+        if not missing:
+            return False
+        model.objects.bulk_create(
+            [model(**item, **defaults) for item in missing.values()],
+            ignore_conflicts=True
+        )
+        for found in model.objects.filter(**{
+            f'{fields[0]}__in': {item[fields[0]] for item in missing.values()}
+        }).values('id', *fields):
+            lookup[lookup_key(found, fields)] = found['id']
+        return True
+
+    def resolve_references(self, records):
+        if self.resolve(
+            self.tags, Tag, ('slug', ),
+            [tag for record in records for tag in record['tags']]
+        ):
+            self.created.add('tags')
+        if self.resolve(
+            self.ingredients, Ingredient, ('name', 'measurement_unit'),
+            [
+                {
+                    'name': item['name'],
+                    'measurement_unit': item['measurement_unit']
+                }
+                for record in records for item in record['ingredients']
+            ]
+        ):
+            self.created.add('ingredients')
+        self.resolve(
+            self.authors, User, ('email', ),
+            [record['author'] for record in records],
+            password=make_password(None)
+        )
+
+    def decode_images(self, records):
+        images = [record['image'] for record in records]
+        if self.executor is None:
+            return list(map(store_image, images))
+        return list(self.executor.map(store_image, images, chunksize=16))
+
+    def build_recipes(self, records, images):
+        keys = {
+            (self.authors.get(record['author']['email']), record['name'])
+            for record in records
+        }
+        existing = set(Recipe.objects.filter(
+            author_id__in={author_id for author_id, _ in keys},
+            name__in={name for _, name in keys}
+        ).values_list('author_id', 'name'))
+        recipes = {}
+        for record, image in zip(records, images):
+            author_id = self.authors.get(record['author']['email'])
+            key = (author_id, record['name'])
+            if author_id is None:
+                self.skipped['нет автора'] += 1
+            elif image is None:
+                self.skipped['некорректное изображение'] += 1
+            elif key in existing or key in recipes:
+                self.skipped['уже есть'] += 1
+            else:
+                recipes[key] = (record, Recipe(
+                    author_id=author_id,
+                    name=record['name'],
+                    text=record['text'],
+                    cooking_time=record['cooking_time'],
+                    image=image,
+                ))
+        return recipes
+
+    def save_recipes(self, recipes):
+        Recipe.objects.bulk_create(
+            [recipe for _, recipe in recipes.values()]
+        )
+        if any(recipe.pk is None for _, recipe in recipes.values()):
+            ids = {
+                (author_id, name): recipe_id
+                for recipe_id, author_id, name in Recipe.objects.filter(
+                    author_id__in={author_id for author_id, _ in recipes},
+                    name__in={name for _, name in recipes}
+                ).values_list('id', 'author_id', 'name')
+            }
+            for key, (_, recipe) in recipes.items():
+                recipe.pk = ids[key]
+        for record, recipe in recipes.values():
+            recipe.pub_date = parse_datetime(record['pub_date'])
+        Recipe.objects.bulk_update(
+            [recipe for _, recipe in recipes.values()], ['pub_date']
+        )
+
+    def save_relations(self, recipes):
+        IngredientRecipe.objects.bulk_create([
+            IngredientRecipe(
+                recipe_id=recipe.id,
+                ingredient_id=self.ingredients[
+                    (item['name'], item['measurement_unit'])
+                ],
+                amount=item['amount']
+            )
+            for record, recipe in recipes.values()
+            for item in record['ingredients']
+        ])
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=self.tags[slug])
+            for record, recipe in recipes.values()
+            for slug in {tag['slug'] for tag in record['tags']}
+        ])
+        RecipeScore.objects.bulk_create([
+            RecipeScore(recipe_id=recipe.id) for _, recipe in recipes.values()
+        ])
+
+    def update_authors(self, recipes):
+        per_author = Counter(author_id for author_id, _ in recipes)
+        by_count = {}
+        for author_id, count in per_author.items():
+            by_count.setdefault(count, []).append(author_id)
+        for count, author_ids in by_count.items():
+            update_counter(Recipe, author_ids, count)
+
+    def import_batch(self, records):
+        images = self.decode_images(records)
+        with transaction.atomic():
+            self.resolve_references(records)
+            recipes = self.build_recipes(records, images)
+            if not recipes:
+                return
+            self.save_recipes(recipes)
+            self.save_relations(recipes)
+            self.update_authors(recipes)
+            recipe_ids = [recipe.id for _, recipe in recipes.values()]
+            Recipe.objects.filter(id__in=recipe_ids).update_search_vector()
+            transaction.on_commit(lambda: log_recipe_changes(recipe_ids))
+        self.imported += len(recipes)
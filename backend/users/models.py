@@ -1,10 +1,41 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
 
 from .settings import EMAIL_MAX_LENGHT, NAME_MAX_LENGHT
 
 
-class User(AbstractUser):
+class CounterFieldsMixin:
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            skipped = {*self.counter_fields, *self.get_deferred_fields()}
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+            ]
+        super().save(*args, **kwargs)
+
+
+class UserQuerySet(models.QuerySet):
+
+    def with_is_subscribed(self, user):
+        if user.is_anonymous:
+            return self.annotate(is_subscribed=models.Value(
+                False, output_field=models.BooleanField()
+            ))
+        return self.annotate(is_subscribed=models.Exists(
+            Follow.objects.filter(
+                user=user, following=models.OuterRef('pk')
+            )
+        ))
+
+
+class CustomUserManager(UserManager.from_queryset(UserQuerySet)):
+    pass
+
+
+class User(CounterFieldsMixin, AbstractUser):
     username = models.CharField(
         'Имя пользователя',
         max_length=NAME_MAX_LENGHT,
@@ -18,8 +49,18 @@ class User(AbstractUser):
     )
     first_name = models.CharField('Имя', max_length=NAME_MAX_LENGHT)
     last_name = models.CharField('Фамилия', max_length=NAME_MAX_LENGHT)
+    recipes_count = models.IntegerField(
+        'Рецептов', default=0, editable=False
+    )
+    followers_count = models.IntegerField(
+        'Подписчиков', default=0, editable=False
+    )
     REQUIRED_FIELDS = ['email', 'first_name', 'last_name']
 
+    objects = CustomUserManager()
+
+    counter_fields = ('recipes_count', 'followers_count')
+
     class Meta:
         ordering = ('id',)
         verbose_name = 'Пользователь'
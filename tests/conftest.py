@@ -0,0 +1,97 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+
+PNG = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywaAAAACV'
+    'BMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNoAAAAg'
+    'gCByxOyYQAAAABJRU5ErkJggg=='
+)
+
+
+@pytest.fixture(autouse=True)
+def isolated_storage(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(
+        username='cook', email='cook@foodgram.local', password='password',
+        first_name='Иван', last_name='Поваров'
+    )
+
+
+@pytest.fixture
+def author(django_user_model):
+    return django_user_model.objects.create_user(
+        username='author', email='author@foodgram.local',
+        password='password', first_name='Анна', last_name='Авторова'
+    )
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def tags():
+    return [
+        Tag.objects.create(name=f'Тег {i}', slug=f'tag-{i}', color='#FFFFFF')
+        for i in range(3)
+    ]
+
+
+@pytest.fixture
+def ingredients():
+    Ingredient.objects.bulk_create([
+        Ingredient(name=f'ингредиент {i:02}', measurement_unit='г')
+        for i in range(40)
+    ])
+    return list(Ingredient.objects.order_by('name'))
+
+
+@pytest.fixture
+def make_recipes(author, tags, ingredients):
+    def make(count, author=author):
+        recipes = []
+        for number in range(count):
+            recipe = Recipe.objects.create(
+                name=f'Рецепт {number}', text='Описание', author=author,
+                image='recipes/images/test.png', cooking_time=10
+            )
+            recipe.tags.set(tags)
+            IngredientRecipe.objects.bulk_create([
+                IngredientRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                )
+                for ingredient in ingredients[:3]
+            ])
+            recipes.append(recipe)
+        return recipes
+    return make
+
+
+@pytest.fixture
+def recipe_payload(tags):
+    def payload(ingredients, name='Новый рецепт', amount=10):
+        return {
+            'name': name,
+            'text': 'Описание',
+            'cooking_time': 15,
+            'image': PNG,
+            'tags': [tag.id for tag in tags],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': amount}
+                for ingredient in ingredients
+            ],
+        }
+    return payload
@@ -0,0 +1,66 @@
+import pytest
+
+from recipes.counters import COUNTERS, deleting, reconcile_counter
+from recipes.models import Favorite, ShoppingCart
+from users.models import Follow
+
+
+@pytest.fixture
+def linked(django_user_model, user, author, make_recipes):
+    other = django_user_model.objects.create_user(
+        username='other', email='other@foodgram.local', password='password'
+    )
+    authored = make_recipes(3)
+    own = make_recipes(2, author=other)
+    for owner in (user, author, other):
+        for recipe in authored + own:
+            Favorite.objects.create(user=owner, recipe=recipe)
+        for recipe in authored[:2] + own[:1]:
+            ShoppingCart.objects.create(user=owner, recipe=recipe)
+        for following in (user, author, other):
+            if following != owner:
+                Follow.objects.create(user=owner, following=following)
+    return other, authored, own
+
+
+def stale_counters():
+    return {
+        model.__name__: reconcile_counter(model, dry_run=True)
+        for model in COUNTERS
+    }
+
+
+@pytest.mark.django_db
+def test_counters_start_consistent(linked):
+    _, authored, _ = linked
+    authored[0].refresh_from_db()
+    assert authored[0].favorites_count == 3
+    assert authored[0].in_carts_count == 3
+    assert set(stale_counters().values()) == {0}
+
+
+@pytest.mark.django_db
+def test_recipe_delete_keeps_counters(linked):
+    _, authored, _ = linked
+    authored[0].delete()
+    assert deleting() == set()
+    assert set(stale_counters().values()) == {0}
+
+
+@pytest.mark.django_db
+def test_user_delete_keeps_counters(linked, user):
+    user.delete()
+    assert deleting() == set()
+    assert set(stale_counters().values()) == {0}
+
+
+@pytest.mark.django_db
+def test_author_delete_keeps_counters(linked, author):
+    other, _, own = linked
+    author.delete()
+    assert deleting() == set()
+    assert set(stale_counters().values()) == {0}
+    own[0].refresh_from_db()
+    other.refresh_from_db()
+    assert own[0].favorites_count == 2
+    assert other.followers_count == 1
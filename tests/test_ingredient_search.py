@@ -0,0 +1,16 @@
+import pytest
+
+from recipes.models import Ingredient
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('in_memory', (True, False))
+def test_ingredient_search_ignores_case(settings, client, in_memory):
+    settings.INGREDIENT_SEARCH_IN_MEMORY = in_memory
+    for name in ('Burrata', 'burger', 'sauce Bu', 'cheddar'):
+        Ingredient.objects.create(name=name, measurement_unit='г')
+    response = client.get('/api/ingredients/', {'name': 'BU'})
+    assert response.status_code == 200
+    assert [item['name'] for item in response.data] == [
+        'burger', 'Burrata', 'sauce Bu'
+    ]
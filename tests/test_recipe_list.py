@@ -0,0 +1,56 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Favorite, ShoppingCart
+
+PAGE_SIZES = (2, 6, 12)
+
+
+def list_query_counts(client, cold):
+    counts = []
+    for limit in PAGE_SIZES:
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/recipes/', {'limit': limit})
+        assert response.status_code == 200
+        assert len(response.data['results']) == limit
+        counts.append(len(queries))
+    return counts
+
+
+@pytest.fixture
+def recipes(make_recipes, user):
+    recipes = make_recipes(12)
+    Favorite.objects.create(user=user, recipe=recipes[0])
+    ShoppingCart.objects.create(user=user, recipe=recipes[1])
+    return recipes
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('cache_enabled', (True, False))
+@pytest.mark.parametrize('cold', (True, False))
+def test_recipe_list_query_count_does_not_depend_on_page_size(
+    settings, user_client, recipes, cache_enabled, cold
+):
+    settings.RECIPE_CACHE_ENABLED = cache_enabled
+    if not cold:
+        user_client.get('/api/recipes/', {'limit': max(PAGE_SIZES)})
+    counts = list_query_counts(user_client, cold)
+    assert len(set(counts)) == 1, counts
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('cache_enabled', (True, False))
+def test_recipe_list_flags(settings, user_client, recipes, cache_enabled):
+    settings.RECIPE_CACHE_ENABLED = cache_enabled
+    response = user_client.get('/api/recipes/', {'limit': 12})
+    flags = {
+        item['id']: (item['is_favorited'], item['is_in_shopping_cart'])
+        for item in response.data['results']
+    }
+    assert flags[recipes[0].id] == (True, False)
+    assert flags[recipes[1].id] == (False, True)
+    assert flags[recipes[2].id] == (False, False)
@@ -0,0 +1,94 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import IngredientRecipe, Recipe
+
+
+def count_queries(method, *args, **kwargs):
+    with CaptureQueriesContext(connection) as queries:
+        response = method(*args, format='json', **kwargs)
+    assert response.status_code in (200, 201), response.data
+    return response, len(queries)
+
+
+def create(client, payload):
+    return count_queries(client.post, '/api/recipes/', payload)
+
+
+@pytest.mark.django_db
+def test_create_query_count_does_not_depend_on_ingredients(
+    user_client, ingredients, recipe_payload
+):
+    _, few = create(user_client, recipe_payload(ingredients[:3], 'Три'))
+    _, many = create(
+        user_client, recipe_payload(ingredients[:30], 'Тридцать')
+    )
+    assert few == many
+
+
+@pytest.mark.django_db
+def test_update_query_count_does_not_depend_on_ingredients(
+    user_client, ingredients, recipe_payload
+):
+    counts = []
+    for size in (3, 30):
+        response, _ = create(
+            user_client, recipe_payload(ingredients[:size], f'Рецепт {size}')
+        )
+        third = size // 3
+        changed = ingredients[:third]
+        kept = ingredients[third:2 * third]
+        added = ingredients[size:size + third]
+        payload = recipe_payload(changed, f'Рецепт {size}', amount=99)
+        payload['ingredients'] += [
+            {'id': ingredient.id, 'amount': 10}
+            for ingredient in kept + added
+        ]
+        _, queries = count_queries(
+            user_client.patch, f'/api/recipes/{response.data["id"]}/',
+            payload
+        )
+        counts.append(queries)
+    assert counts[0] == counts[1]
+
+
+@pytest.mark.django_db
+def test_update_diffs_ingredients(user_client, ingredients, recipe_payload):
+    response, _ = create(user_client, recipe_payload(ingredients[:3]))
+    recipe = Recipe.objects.get(id=response.data['id'])
+    before = {
+        item.ingredient_id: item.id
+        for item in recipe.ingredients_recipe.all()
+    }
+    changed, kept, removed = ingredients[:3]
+    added = ingredients[3]
+    payload = recipe_payload([changed], amount=50)
+    payload['ingredients'] += [
+        {'id': kept.id, 'amount': 10},
+        {'id': added.id, 'amount': 7},
+    ]
+    with CaptureQueriesContext(connection) as queries:
+        response = user_client.patch(
+            f'/api/recipes/{recipe.id}/', payload, format='json'
+        )
+    assert response.status_code == 200
+    rows = {
+        item.ingredient_id: item
+        for item in IngredientRecipe.objects.filter(recipe=recipe)
+    }
+    assert set(rows) == {changed.id, kept.id, added.id}
+    assert rows[changed.id].id == before[changed.id]
+    assert rows[changed.id].amount == 50
+    assert rows[kept.id].id == before[kept.id]
+    assert rows[kept.id].amount == 10
+    assert rows[added.id].amount == 7
+    table = IngredientRecipe._meta.db_table
+    statements = [
+        query['sql'] for query in queries.captured_queries
+        if f'"{table}"' in query['sql'].split(' WHERE ')[0]
+    ]
+    assert sum(sql.startswith('INSERT') for sql in statements) == 1
+    assert sum(sql.startswith('DELETE') for sql in statements) == 1
+    updates = [sql for sql in statements if sql.startswith('UPDATE')]
+    assert len(updates) == 1 and 'CASE' in updates[0]
@@ -0,0 +1,121 @@
+import pytest
+from rest_framework.test import APIClient
+
+from recipes import models
+from recipes.models import ShoppingCart, ShoppingListItem
+
+
+def totals(user):
+    return dict(
+        ShoppingListItem.objects.filter(user=user).values_list(
+            'ingredient', 'total_amount'
+        )
+    )
+
+
+@pytest.fixture
+def author_client(author):
+    client = APIClient()
+    client.force_authenticate(author)
+    return client
+
+
+@pytest.mark.django_db
+def test_single_cart_toggles_keep_totals(user, user_client, make_recipes):
+    recipes = make_recipes(3)
+    for recipe in recipes:
+        response = user_client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        assert response.status_code == 201
+        assert ShoppingListItem.objects.inconsistencies() == []
+    assert set(totals(user).values()) == {1 + 2 + 3}
+    response = user_client.delete(
+        f'/api/recipes/{recipes[1].id}/shopping_cart/'
+    )
+    assert response.status_code == 204
+    assert set(totals(user).values()) == {1 + 3}
+    for recipe in (recipes[0], recipes[2]):
+        user_client.delete(f'/api/recipes/{recipe.id}/shopping_cart/')
+    assert totals(user) == {}
+    assert ShoppingListItem.objects.inconsistencies() == []
+
+
+@pytest.mark.django_db
+def test_batch_cart_toggles_keep_totals(user, user_client, make_recipes):
+    ids = [recipe.id for recipe in make_recipes(4)]
+    response = user_client.post(
+        '/api/recipes/shopping_cart/', {'ids': ids[:3]}, format='json'
+    )
+    assert response.status_code == 200
+    response = user_client.post(
+        '/api/recipes/shopping_cart/', {'ids': ids}, format='json'
+    )
+    assert [item['status'] for item in response.data] == [
+        'exists', 'exists', 'exists', 'added'
+    ]
+    assert set(totals(user).values()) == {1 + 2 + 3 + 4}
+    assert ShoppingListItem.objects.inconsistencies() == []
+    user_client.delete(
+        '/api/recipes/shopping_cart/', {'ids': ids[1:]}, format='json'
+    )
+    assert set(totals(user).values()) == {1}
+    assert ShoppingListItem.objects.inconsistencies() == []
+
+
+@pytest.mark.django_db
+def test_recipe_update_changes_carts(
+    user, author, author_client, ingredients, make_recipes, recipe_payload
+):
+    recipe, other = make_recipes(2)
+    for cart_user in (user, author):
+        ShoppingCart.objects.create(user=cart_user, recipe=recipe)
+        ShoppingCart.objects.create(user=cart_user, recipe=other)
+    ShoppingListItem.objects.rebuild()
+    payload = recipe_payload(ingredients[1:5], recipe.name, amount=7)
+    response = author_client.patch(
+        f'/api/recipes/{recipe.id}/', payload, format='json'
+    )
+    assert response.status_code == 200
+    assert ShoppingListItem.objects.inconsistencies() == []
+    assert totals(user) == {
+        ingredients[0].id: 2,
+        ingredients[1].id: 7 + 2,
+        ingredients[2].id: 7 + 2,
+        ingredients[3].id: 7,
+        ingredients[4].id: 7,
+    }
+
+
+@pytest.mark.django_db
+def test_recipe_delete_removes_it_from_carts(
+    user, author, author_client, make_recipes
+):
+    recipe, other = make_recipes(2)
+    for cart_user in (user, author):
+        ShoppingCart.objects.create(user=cart_user, recipe=recipe)
+    ShoppingCart.objects.create(user=user, recipe=other)
+    ShoppingListItem.objects.rebuild()
+    response = author_client.delete(f'/api/recipes/{recipe.id}/')
+    assert response.status_code == 204
+    assert ShoppingListItem.objects.inconsistencies() == []
+    assert set(totals(user).values()) == {2}
+    assert totals(author) == {}
+
+
+@pytest.mark.django_db
+def test_apply_deltas_upserts_in_batches(
+    monkeypatch, user, author, ingredients
+):
+    monkeypatch.setattr(models, 'SHOPPING_LIST_UPSERT_BATCH_SIZE', 3)
+    users = [user.id, author.id]
+    first = {ingredient.id: 5 for ingredient in ingredients[:4]}
+    ShoppingListItem.objects.apply_deltas(users, first)
+    ShoppingListItem.objects.apply_deltas(users, {
+        ingredients[0].id: -5, ingredients[1].id: -2, ingredients[4].id: 1
+    })
+    for cart_user in (user, author):
+        assert totals(cart_user) == {
+            ingredients[1].id: 3,
+            ingredients[2].id: 5,
+            ingredients[3].id: 5,
+            ingredients[4].id: 1,
+        }
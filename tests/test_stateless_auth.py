@@ -0,0 +1,136 @@
+import time
+
+import pytest
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from api.authentication import (
+    StatelessTokenAuthentication,
+    revocation_cache,
+    revoked_session_key
+)
+
+
+@pytest.fixture
+def stateless(settings, monkeypatch):
+    settings.AUTH_STATELESS = True
+    monkeypatch.setattr(APIView, 'authentication_classes', [
+        StatelessTokenAuthentication, *APIView.authentication_classes
+    ])
+    caches[settings.AUTH_REVOCATION_CACHE_ALIAS].clear()
+    revocation_cache.clear()
+    yield
+    caches[settings.AUTH_REVOCATION_CACHE_ALIAS].clear()
+    revocation_cache.clear()
+
+
+def login(email='cook@foodgram.local', password='password'):
+    response = APIClient().post(
+        '/api/auth/token/login/', {'email': email, 'password': password}
+    )
+    assert response.status_code == 201, response.data
+    return response.data['auth_token'], response.data['refresh_token']
+
+
+def client_for(access, keyword='Token'):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'{keyword} {access}')
+    return client
+
+
+def refresh(token):
+    return APIClient().post('/api/auth/token/refresh/', {'refresh': token})
+
+
+@pytest.mark.django_db
+def test_login_issues_signed_tokens(stateless, user):
+    access, _ = login()
+    for keyword in ('Token', 'Bearer'):
+        response = client_for(access, keyword).get('/api/users/me/')
+        assert response.status_code == 200
+        assert response.data['id'] == user.id
+
+
+@pytest.mark.django_db
+def test_valid_token_skips_revocation_store(stateless, user):
+    client = client_for(login()[0])
+    assert client.get('/api/users/me/').status_code == 200
+    with CaptureQueriesContext(connection) as queries:
+        assert client.get('/api/users/me/').status_code == 200
+    assert not [
+        query for query in queries if 'auth_cache' in query['sql']
+    ]
+
+
+@pytest.mark.django_db
+def test_refresh_issues_working_access_token(stateless, user):
+    _, refresh_token = login()
+    response = refresh(refresh_token)
+    assert response.status_code == 200
+    access = response.data['auth_token']
+    assert client_for(access).get('/api/users/me/').status_code == 200
+    assert refresh('garbage').status_code == 400
+
+
+@pytest.mark.django_db
+def test_logout_revokes_only_its_session(stateless, user):
+    access, refresh_token = login()
+    other, _ = login()
+    client = client_for(access)
+    assert client.get('/api/users/me/').status_code == 200
+    assert client.post('/api/auth/token/logout/').status_code == 204
+    assert client.get('/api/users/me/').status_code == 401
+    assert refresh(refresh_token).status_code == 400
+    assert client_for(other).get('/api/users/me/').status_code == 200
+
+
+@pytest.mark.django_db
+def test_revocation_from_other_process_expires_local_copy(
+    stateless, settings, monkeypatch, user
+):
+    access, refresh_token = login()
+    client = client_for(access)
+    assert client.get('/api/users/me/').status_code == 200
+    sid = client.get('/api/users/me/').wsgi_request.auth['sid']
+    caches[settings.AUTH_REVOCATION_CACHE_ALIAS].set(
+        revoked_session_key(sid), True
+    )
+    assert refresh(refresh_token).status_code == 400
+    assert client.get('/api/users/me/').status_code == 200
+    expired = time.monotonic() + settings.AUTH_REVOCATION_LOCAL_TIMEOUT + 1
+    monkeypatch.setattr(time, 'monotonic', lambda: expired)
+    assert client.get('/api/users/me/').status_code == 401
+
+
+@pytest.mark.django_db(transaction=True)
+def test_password_change_revokes_tokens(stateless, user):
+    access, refresh_token = login()
+    response = client_for(access).post('/api/users/set_password/', {
+        'current_password': 'password', 'new_password': 'Another-pass-42'
+    })
+    assert response.status_code == 204
+    assert client_for(access).get('/api/users/me/').status_code == 401
+    assert refresh(refresh_token).status_code == 400
+    access, _ = login(password='Another-pass-42')
+    assert client_for(access).get('/api/users/me/').status_code == 200
+
+
+@pytest.mark.django_db(transaction=True)
+def test_deactivation_revokes_tokens(stateless, user):
+    access, _ = login()
+    user.is_active = False
+    user.save()
+    assert client_for(access).get('/api/users/me/').status_code == 401
+
+
+@pytest.mark.django_db(transaction=True)
+def test_profile_edit_keeps_tokens(stateless, user):
+    access, refresh_token = login()
+    user.first_name = 'Пётр'
+    user.save()
+    login()
+    assert client_for(access).get('/api/users/me/').status_code == 200
+    assert refresh(refresh_token).status_code == 200